@@ -0,0 +1,296 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Pipeline Scale Benchmark
+## +-----------------------------------
+
+import argparse
+import json
+import logging
+import os
+import random
+import runpy
+import shlex
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import tracemalloc
+
+import standin
+
+"""
+Runs the pipeline scripts against a synthetic organization and synthetic templates served by a local stand-in
+(see standin.py), and reports the wall time, the API calls per operation and the peak memory of each stage.
+No AWS account is needed. Example:
+python benchmark.py --permission-sets 100 --accounts 1000 --ou-depth 3 --assignments 500 --latency 20 --throttle-rate 0.05
+"""
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The stages import the identitycenter package from source/, as 'python -m identitycenter' does from that folder
+sys.path.insert(0, os.path.join(REPOSITORY, 'source'))
+
+from identitycenter import policy_lint
+
+STAGES = {
+    'validation': 'source/validation/iam-identitycenter-validation.py',
+    'permissionsets': 'source/permissionsets/iam-identitycenter-permissionset.py',
+    'assignments': 'source/assignments/iam-identitycenter-assignments.py',
+    # The three stages in one process (python -m identitycenter all)
+    'all': 'source/identitycenter/__main__.py',
+    # Read-only drift report (python -m identitycenter drift)
+    'drift': 'source/identitycenter/__main__.py'
+}
+
+ACTIONS = [
+    'ec2:Describe*', 'ec2:StartInstances', 'ec2:StopInstances', 'ec2:RebootInstances', 's3:GetObject', 's3:PutObject', 's3:List*',
+    'logs:GetLogEvents', 'logs:FilterLogEvents', 'cloudwatch:GetMetricData', 'cloudwatch:PutMetricAlarm', 'ssm:StartSession',
+    'ssm:GetParameter*', 'rds:Describe*', 'rds:RebootDBInstance', 'lambda:InvokeFunction', 'lambda:Get*', 'iam:PassRole',
+    'dynamodb:Query', 'dynamodb:GetItem', 'ecs:UpdateService', 'eks:Describe*', 'kms:Decrypt', 'sqs:SendMessage', 'sns:Publish'
+]
+MANAGED_POLICIES = [
+    'arn:aws:iam::aws:policy/ReadOnlyAccess', 'arn:aws:iam::aws:policy/job-function/ViewOnlyAccess',
+    'arn:aws:iam::aws:policy/SecurityAudit', 'arn:aws:iam::aws:policy/job-function/DatabaseAdministrator'
+]
+
+# Setting arguments
+parser = argparse.ArgumentParser(description='AWS SSO Pipeline scale benchmark')
+parser.add_argument('--permission-sets', action="store", dest='permissionSets', type=int, default=50,
+    help='Number of permission set templates. Default: %(default)s')
+parser.add_argument('--accounts', action="store", dest='accounts', type=int, default=200,
+    help='Number of accounts in the organization. Default: %(default)s')
+parser.add_argument('--ou-depth', action="store", dest='ouDepth', type=int, default=3,
+    help='Depth of the OU tree. Default: %(default)s')
+parser.add_argument('--ou-fanout', action="store", dest='ouFanout', type=int, default=3,
+    help='Number of child OUs of each OU. Default: %(default)s')
+parser.add_argument('--assignments', action="store", dest='assignments', type=int, default=100,
+    help='Number of assignment templates. Default: %(default)s')
+parser.add_argument('--groups', action="store", dest='groups', type=int, default=50,
+    help='Number of groups in the Identity Store. Default: %(default)s')
+parser.add_argument('--latency', action="store", dest='latency', type=float, default=0,
+    help='Latency added to each API call, in milliseconds. Default: %(default)s')
+parser.add_argument('--throttle-rate', action="store", dest='throttleRate', type=float, default=0,
+    help='Fraction of the API calls (0 to 1) answered with ThrottlingException. Default: %(default)s')
+parser.add_argument('--service-rate', action="store", dest='serviceRate', type=int, default=0,
+    help='Calls per second accepted by each service before throttling. Default: unlimited')
+parser.add_argument('--provisioning-polls', action="store", dest='provisioningPolls', type=int, default=1,
+    help='Status checks needed before a provisioning or assignment request finishes. Default: %(default)s')
+parser.add_argument('--stages', action="store", dest='stages', nargs='+', choices=list(STAGES), default=['validation', 'permissionsets', 'assignments'],
+    help='Stages to run, in order. "all" runs the three stages in one process and "drift" the read-only drift report. Default: validation permissionsets assignments')
+parser.add_argument('--validation-args', action="store", dest='validationArgs', default='',
+    help='Extra arguments of the validation script')
+parser.add_argument('--permissionsets-args', action="store", dest='permissionsetsArgs', default='',
+    help='Extra arguments of the permission sets script (e.g. "--workers 10 --diff")')
+parser.add_argument('--assignments-args', action="store", dest='assignmentsArgs', default='',
+    help='Extra arguments of the assignments script')
+parser.add_argument('--drift-args', action="store", dest='driftArgs', default='',
+    help='Extra arguments of the drift command')
+parser.add_argument('--no-memory', action="store_false", dest='memory',
+    help='Do not trace memory allocations (tracing makes the stages slower)')
+parser.add_argument('--seed', action="store", dest='seed', type=int, default=1,
+    help='Seed of the synthetic data and of the random throttling. Default: %(default)s')
+parser.add_argument('--output', action="store", dest='output',
+    help='Write the report as JSON to this file')
+parser.add_argument('--keep', action="store_true", dest='keep',
+    help='Keep the workspace with the synthetic templates and the stage outputs')
+parser.add_argument('--verbose', action="store_true", dest='verbose',
+    help='Show the logs of the scripts')
+args = parser.parse_args()
+
+# Creates the OU tree (ouDepth levels of ouFanout OUs) and spreads the accounts over the root and all OUs
+def build_organization(standIn):
+    ous = []
+    parents = [standIn.rootId]
+    for level in range(args.ouDepth):
+        parents = [standIn.add_ou(parent) for parent in parents for child in range(args.ouFanout)]
+        ous.extend(parents)
+
+    containers = [standIn.rootId] + ous
+    accounts = [standIn.add_account(containers[index % len(containers)]) for index in range(args.accounts)]
+    for index in range(args.groups):
+        standIn.add_group(f'Group{index:04d}')
+    return ous, accounts
+
+def build_permission_set_templates(random):
+    templates = []
+    for index in range(args.permissionSets):
+        statements = []
+        for statement in range(random.randint(1, 3)):
+            statements.append({
+                'Sid': f'Statement{statement}',
+                'Effect': random.choice(['Allow', 'Allow', 'Deny']),
+                'Action': sorted(random.sample(ACTIONS, random.randint(2, 10))),
+                'Resource': '*'
+            })
+        template = {
+            'Name': f'PermissionSet{index:04d}',
+            'Description': f'Synthetic permission set {index}',
+            'SessionDuration': random.choice(['PT1H', 'PT4H', 'PT8H']),
+            'ManagedPolicies': sorted(random.sample(MANAGED_POLICIES, random.randint(0, 2))),
+            'CustomPolicy': {'Version': '2012-10-17', 'Statement': statements}
+        }
+        if index % 5 == 0:
+            template['PermissionBoundary'] = {'PolicyType': 'AWS', 'Policy': 'arn:aws:iam::aws:policy/PowerUserAccess'}
+        templates.append(template)
+    return templates
+
+def build_assignment_templates(random, ous, accounts, permissionSetTemplates):
+    assignments = []
+    for index in range(args.assignments):
+        targets = []
+        for target in range(random.randint(1, 3)):
+            kind = random.random()
+            if kind < 0.02:
+                targets.append('Root')
+            elif kind < 0.5 and ous:
+                ou = random.choice(ous)
+                targets.append(f'ou:{ou}:*' if random.random() < 0.3 else f'ou:{ou}')
+            else:
+                targets.append(f'account:{random.choice(accounts)}')
+        assignments.append({
+            'SID': f'Assignment{index:05d}',
+            'Target': targets,
+            'PrincipalType': 'GROUP',
+            'PrincipalId': f'Group{random.randrange(max(1, args.groups)):04d}',
+            'PermissionSetName': random.choice(permissionSetTemplates)['Name']
+        })
+    return assignments
+
+# Lays out the synthetic templates as in the repository, so the scripts find them in ../../templates/
+def build_workspace(permissionSetTemplates, assignments):
+    workspace = tempfile.mkdtemp(prefix='sso-benchmark-')
+    os.makedirs(os.path.join(workspace, 'templates', 'permissionsets'))
+    os.makedirs(os.path.join(workspace, 'templates', 'assignments'))
+    for template in permissionSetTemplates:
+        with open(os.path.join(workspace, 'templates', 'permissionsets', template['Name'] + '.json'), 'w') as f:
+            json.dump(template, f, indent=4)
+    with open(os.path.join(workspace, 'templates', 'assignments', 'assignments.json'), 'w') as f:
+        json.dump({'Assignments': assignments}, f, indent=4)
+    for stage in STAGES.values():
+        os.makedirs(os.path.join(workspace, os.path.dirname(stage)), exist_ok=True)
+
+    # Action catalog of the synthetic policies, where the buildspec of the validation stage creates the real one
+    services = {}
+    for action in ACTIONS:
+        prefix, actionName = action.split(':', 1)
+        services.setdefault(prefix, {'Actions': [], 'ConditionKeys': []})['Actions'].append(actionName.replace('*', 'Instances'))
+    policy_lint.write_catalog(policy_lint.new_catalog('benchmark', services), os.path.join(workspace, 'source', 'validation', 'action-catalog.json.gz'))
+    return workspace
+
+def stage_arguments(stage, standIn):
+    if stage == 'validation':
+        return (['--ps-folder', '../../templates/permissionsets/', '--assignments-folder', '../../templates/assignments/', '--action-catalog', 'action-catalog.json.gz']
+            + shlex.split(args.validationArgs))
+    if stage == 'permissionsets':
+        return shlex.split(args.permissionsetsArgs)
+    if stage == 'all':
+        return (['all', '--mgmt_account', standIn.managementAccount, '--action-catalog', '../validation/action-catalog.json.gz'] + shlex.split(args.validationArgs)
+            + shlex.split(args.permissionsetsArgs) + shlex.split(args.assignmentsArgs))
+    if stage == 'drift':
+        return ['drift', '--mgmt_account', standIn.managementAccount] + shlex.split(args.driftArgs)
+    return ['--mgmt_account', standIn.managementAccount] + shlex.split(args.assignmentsArgs)
+
+# Runs one script as CodeBuild does (from its folder) and measures it
+def run_stage(stage, standIn, workspace):
+    script = os.path.join(REPOSITORY, STAGES[stage])
+    argv = list(sys.argv)
+    cwd = os.getcwd()
+    os.chdir(os.path.join(workspace, os.path.dirname(STAGES[stage])))
+    sys.argv = [script] + stage_arguments(stage, standIn)
+    standIn.reset_counters()
+    # Each stage runs in its own process in CodeBuild, so clients are not reused between stages
+    if 'identitycenter.clients' in sys.modules:
+        sys.modules['identitycenter.clients'].reset()
+    if args.memory:
+        tracemalloc.start()
+
+    exitCode = 0
+    start = time.perf_counter()
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as error:
+        exitCode = error.code or 0
+    except Exception:
+        traceback.print_exc()
+        exitCode = 1
+    wallTime = time.perf_counter() - start
+
+    peakMemory = None
+    if args.memory:
+        peakMemory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    sys.argv = argv
+    os.chdir(cwd)
+
+    return {
+        'Stage': stage,
+        'ExitCode': exitCode,
+        'WallTime': round(wallTime, 3),
+        'PeakMemoryBytes': peakMemory,
+        'Calls': sum(standIn.calls.values()),
+        'Throttles': sum(standIn.throttles.values()),
+        'Writes': sum(standIn.writes.values()),
+        'CallsByOperation': dict(sorted(standIn.calls.items())),
+        'ThrottlesByOperation': dict(sorted(standIn.throttles.items()))
+    }
+
+def print_report(report):
+    print(f"\nSynthetic organization: {report['Parameters']['accounts']} accounts, {report['OUs']} OUs, "
+        f"{report['Parameters']['permissionSets']} permission sets, {report['Parameters']['assignments']} assignments")
+    for result in report['Stages']:
+        memory = f"{result['PeakMemoryBytes'] / 1048576:.1f} MiB" if result['PeakMemoryBytes'] is not None else 'not traced'
+        print(f"\n[{result['Stage']}] exit {result['ExitCode']}, {result['WallTime']}s, {result['Calls']} calls "
+            f"({result['Throttles']} throttled, {result['Writes']} writes), peak memory {memory}")
+        for operation, calls in result['CallsByOperation'].items():
+            throttles = result['ThrottlesByOperation'].get(operation, 0)
+            print(f"    {operation:<60} {calls:>8}" + (f"  ({throttles} throttled)" if throttles else ''))
+
+def main():
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    generator = random.Random(args.seed)
+    standIn = standin.StandIn(latency=args.latency / 1000, throttleRate=args.throttleRate, serviceRate=args.serviceRate,
+        provisioningPolls=args.provisioningPolls, seed=args.seed)
+    ous, accounts = build_organization(standIn)
+    permissionSetTemplates = build_permission_set_templates(generator)
+    assignments = build_assignment_templates(generator, ous, accounts, permissionSetTemplates)
+    workspace = build_workspace(permissionSetTemplates, assignments)
+
+    # The assignments script only sees permission sets created by the pipeline
+    if {'assignments', 'drift'} & set(args.stages) and not {'permissionsets', 'all'} & set(args.stages):
+        for template in permissionSetTemplates:
+            standIn.add_permission_set(template['Name'])
+
+    standin.install(standIn)
+    report = {'Parameters': vars(args), 'OUs': len(ous), 'Stages': []}
+    for stage in args.stages:
+        report['Stages'].append(run_stage(stage, standIn, workspace))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    if args.keep:
+        print(f"\nWorkspace kept in {workspace}")
+    else:
+        shutil.rmtree(workspace)
+
+    if any(result['ExitCode'] for result in report['Stages']):
+        exit(1)
+
+main()
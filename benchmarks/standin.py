@@ -0,0 +1,401 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | Local stand-in for AWS SSO, Identity Store, Organizations, IAM and Access Analyzer
+## +-----------------------------------
+
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from xml.sax.saxutils import escape
+
+import boto3
+from botocore.awsrequest import AWSResponse
+
+# Operations that change something. They are counted separately in the report
+WRITE_PREFIXES = ('Create', 'Delete', 'Update', 'Put', 'Attach', 'Detach', 'Provision', 'Tag', 'Untag')
+
+# Keeps the operation being called by each thread, between the parameter build and the send events
+currentCall = threading.local()
+
+class StandInBody:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+# In-memory state of an AWS SSO instance and its organization. Each operation is a method named
+# <service>__<Operation> that receives the request parameters and returns the response (or an error).
+# Responses are serialized to the wire format of the service and parsed by botocore, so the retries and the token bucket
+# shared by the calls to each service (see throttling.py) react to throttling as they do against AWS.
+class StandIn:
+    def __init__(self, latency=0.0, throttleRate=0.0, serviceRate=0, provisioningPolls=1, seed=1):
+        self.latency = latency
+        self.throttleRate = throttleRate
+        self.serviceRate = serviceRate
+        self.provisioningPolls = provisioningPolls
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counter = itertools.count()
+        self.calls = Counter()
+        self.throttles = Counter()
+        self.writes = Counter()
+        self.rateWindows = {}
+
+        self.instanceArn = 'arn:aws:sso:::instance/ssoins-0000000000000000'
+        self.identityStoreId = 'd-0000000000'
+        self.rootId = 'r-0000'
+        self.managementAccount = None
+        self.permissionSets = {}
+        self.ous = {}
+        self.accounts = {}
+        self.groups = {}
+        self.users = {}
+        self.assignments = set()
+        self.requests = {}
+
+    def reset_counters(self):
+        with self.lock:
+            self.calls.clear()
+            self.throttles.clear()
+            self.writes.clear()
+
+    # ---- State
+
+    def add_permission_set(self, name, tagged=True):
+        arn = f'{self.instanceArn}/ps-{next(self.counter):016x}'
+        self.permissionSets[arn] = {
+            'Name': name, 'Description': name, 'SessionDuration': 'PT1H', 'RelayState': None,
+            'Tags': [{'Key': 'SSOPipeline', 'Value': 'true'}] if tagged else [],
+            'InlinePolicy': '', 'ManagedPolicies': [], 'CustomerManagedPolicies': [], 'PermissionsBoundary': None
+        }
+        return arn
+
+    def add_ou(self, parent):
+        ou = f'ou-{self.rootId[2:]}-{next(self.counter):08x}'
+        self.ous[ou] = parent
+        return ou
+
+    def add_account(self, parent, status='ACTIVE'):
+        account = f'{100000000000 + next(self.counter):012d}'
+        self.accounts[account] = {'Parent': parent, 'Status': status}
+        if self.managementAccount is None:
+            self.managementAccount = account
+        return account
+
+    def add_group(self, name):
+        self.groups[name] = str(uuid.UUID(int=self.random.getrandbits(128)))
+
+    def add_user(self, name):
+        self.users[name] = str(uuid.UUID(int=self.random.getrandbits(128)))
+
+    # ---- Request handling
+
+    # Returns True when the call must be throttled, either randomly (throttleRate) or because
+    # the service received more than serviceRate calls in the current second
+    def throttled(self, service):
+        if self.throttleRate and self.random.random() < self.throttleRate:
+            return True
+        if self.serviceRate:
+            second = int(time.monotonic())
+            window = self.rateWindows.get(service)
+            if window is None or window[0] != second:
+                window = [second, 0]
+                self.rateWindows[service] = window
+            window[1] += 1
+            return window[1] > self.serviceRate
+        return False
+
+    def handle(self, service, operation, params):
+        if self.latency:
+            time.sleep(self.latency)
+
+        name = f'{service}.{operation}'
+        with self.lock:
+            self.calls[name] += 1
+            if self.throttled(service):
+                self.throttles[name] += 1
+                return error('ThrottlingException', 400)
+            if operation.startswith(WRITE_PREFIXES):
+                self.writes[name] += 1
+            handler = getattr(self, f"{service.replace('-', '_')}__{operation}", None)
+            if handler is None:
+                raise NotImplementedError(f'The stand-in does not implement {name}')
+            return handler(params)
+
+    def page(self, items, params, key, size=100, tokenKey='NextToken'):
+        start = int(params.get(tokenKey) or 0)
+        response = {key: items[start:start + size]}
+        if start + size < len(items):
+            response[tokenKey] = str(start + size)
+        return response
+
+    def new_request(self, status):
+        requestId = str(uuid.uuid4())
+        self.requests[requestId] = dict(status, RequestId=requestId, Status='IN_PROGRESS', Polls=0)
+        return {'RequestId': requestId, 'Status': 'IN_PROGRESS'}
+
+    def poll_request(self, requestId):
+        request = self.requests[requestId]
+        request['Polls'] += 1
+        if request['Polls'] >= self.provisioningPolls:
+            request['Status'] = 'SUCCEEDED'
+        return {key: value for key, value in request.items() if key != 'Polls'}
+
+    # ---- sso-admin
+
+    def sso_admin__ListInstances(self, params):
+        return {'Instances': [{'InstanceArn': self.instanceArn, 'IdentityStoreId': self.identityStoreId}]}
+
+    def sso_admin__ListPermissionSets(self, params):
+        return self.page(sorted(self.permissionSets), params, 'PermissionSets')
+
+    def sso_admin__ListTagsForResource(self, params):
+        return {'Tags': self.permissionSets[params['ResourceArn']]['Tags']}
+
+    def sso_admin__TagResource(self, params):
+        tags = {tag['Key']: tag for tag in self.permissionSets[params['ResourceArn']]['Tags']}
+        tags.update({tag['Key']: tag for tag in params['Tags']})
+        self.permissionSets[params['ResourceArn']]['Tags'] = list(tags.values())
+        return {}
+
+    def sso_admin__DescribePermissionSet(self, params):
+        permissionSet = self.permissionSets.get(params['PermissionSetArn'])
+        if permissionSet is None:
+            return error('ResourceNotFoundException', 400)
+        description = {key: permissionSet[key] for key in ('Name', 'Description', 'SessionDuration', 'RelayState') if permissionSet[key]}
+        return {'PermissionSet': dict(description, PermissionSetArn=params['PermissionSetArn'])}
+
+    def sso_admin__CreatePermissionSet(self, params):
+        if any(permissionSet['Name'] == params['Name'] for permissionSet in self.permissionSets.values()):
+            return error('ConflictException', 400)
+        arn = self.add_permission_set(params['Name'], tagged=False)
+        self.permissionSets[arn].update({key: params[key] for key in ('Description', 'SessionDuration', 'RelayState') if key in params})
+        self.permissionSets[arn]['Tags'] = params.get('Tags', [])
+        return {'PermissionSet': {'Name': params['Name'], 'PermissionSetArn': arn}}
+
+    def sso_admin__UpdatePermissionSet(self, params):
+        self.permissionSets[params['PermissionSetArn']].update({key: params[key] for key in ('Description', 'SessionDuration', 'RelayState') if key in params})
+        return {}
+
+    def sso_admin__DeletePermissionSet(self, params):
+        del self.permissionSets[params['PermissionSetArn']]
+        return {}
+
+    def sso_admin__GetInlinePolicyForPermissionSet(self, params):
+        return {'InlinePolicy': self.permissionSets[params['PermissionSetArn']]['InlinePolicy']}
+
+    def sso_admin__PutInlinePolicyToPermissionSet(self, params):
+        self.permissionSets[params['PermissionSetArn']]['InlinePolicy'] = params['InlinePolicy']
+        return {}
+
+    def sso_admin__DeleteInlinePolicyFromPermissionSet(self, params):
+        self.permissionSets[params['PermissionSetArn']]['InlinePolicy'] = ''
+        return {}
+
+    def sso_admin__ListManagedPoliciesInPermissionSet(self, params):
+        policies = [{'Arn': arn, 'Name': arn.split('/')[-1]} for arn in self.permissionSets[params['PermissionSetArn']]['ManagedPolicies']]
+        return self.page(policies, params, 'AttachedManagedPolicies', 10)
+
+    def sso_admin__AttachManagedPolicyToPermissionSet(self, params):
+        policies = self.permissionSets[params['PermissionSetArn']]['ManagedPolicies']
+        if params['ManagedPolicyArn'] in policies:
+            return error('ConflictException', 400)
+        policies.append(params['ManagedPolicyArn'])
+        return {}
+
+    def sso_admin__DetachManagedPolicyFromPermissionSet(self, params):
+        self.permissionSets[params['PermissionSetArn']]['ManagedPolicies'].remove(params['ManagedPolicyArn'])
+        return {}
+
+    def sso_admin__ListCustomerManagedPolicyReferencesInPermissionSet(self, params):
+        references = self.permissionSets[params['PermissionSetArn']]['CustomerManagedPolicies']
+        return self.page(references, params, 'CustomerManagedPolicyReferences', 10)
+
+    def sso_admin__AttachCustomerManagedPolicyReferenceToPermissionSet(self, params):
+        references = self.permissionSets[params['PermissionSetArn']]['CustomerManagedPolicies']
+        reference = dict({'Path': '/'}, **params['CustomerManagedPolicyReference'])
+        if reference in references:
+            return error('ConflictException', 400)
+        references.append(reference)
+        return {}
+
+    def sso_admin__DetachCustomerManagedPolicyReferenceFromPermissionSet(self, params):
+        reference = dict({'Path': '/'}, **params['CustomerManagedPolicyReference'])
+        self.permissionSets[params['PermissionSetArn']]['CustomerManagedPolicies'].remove(reference)
+        return {}
+
+    def sso_admin__GetPermissionsBoundaryForPermissionSet(self, params):
+        boundary = self.permissionSets[params['PermissionSetArn']]['PermissionsBoundary']
+        if not boundary:
+            return error('ResourceNotFoundException', 400)
+        return {'PermissionsBoundary': boundary}
+
+    def sso_admin__PutPermissionsBoundaryToPermissionSet(self, params):
+        self.permissionSets[params['PermissionSetArn']]['PermissionsBoundary'] = params['PermissionsBoundary']
+        return {}
+
+    def sso_admin__DeletePermissionsBoundaryFromPermissionSet(self, params):
+        if not self.permissionSets[params['PermissionSetArn']]['PermissionsBoundary']:
+            return error('ResourceNotFoundException', 400)
+        self.permissionSets[params['PermissionSetArn']]['PermissionsBoundary'] = None
+        return {}
+
+    def sso_admin__ProvisionPermissionSet(self, params):
+        status = self.new_request({'PermissionSetArn': params['PermissionSetArn']})
+        return {'PermissionSetProvisioningStatus': dict(status, PermissionSetArn=params['PermissionSetArn'])}
+
+    def sso_admin__DescribePermissionSetProvisioningStatus(self, params):
+        return {'PermissionSetProvisioningStatus': self.poll_request(params['ProvisionPermissionSetRequestId'])}
+
+    def sso_admin__ListAccountsForProvisionedPermissionSet(self, params):
+        accounts = sorted({account for (account, arn, principalType, principalId) in self.assignments if arn == params['PermissionSetArn']})
+        return self.page(accounts, params, 'AccountIds')
+
+    def sso_admin__ListAccountAssignments(self, params):
+        assignments = [
+            {'AccountId': account, 'PermissionSetArn': arn, 'PrincipalType': principalType, 'PrincipalId': principalId}
+            for (account, arn, principalType, principalId) in sorted(self.assignments)
+            if account == params['AccountId'] and arn == params['PermissionSetArn']
+        ]
+        return self.page(assignments, params, 'AccountAssignments')
+
+    def sso_admin__CreateAccountAssignment(self, params):
+        self.assignments.add((params['TargetId'], params['PermissionSetArn'], params['PrincipalType'], params['PrincipalId']))
+        return {'AccountAssignmentCreationStatus': self.new_request({'TargetId': params['TargetId']})}
+
+    def sso_admin__DeleteAccountAssignment(self, params):
+        self.assignments.discard((params['TargetId'], params['PermissionSetArn'], params['PrincipalType'], params['PrincipalId']))
+        return {'AccountAssignmentDeletionStatus': self.new_request({'TargetId': params['TargetId']})}
+
+    def sso_admin__DescribeAccountAssignmentCreationStatus(self, params):
+        return {'AccountAssignmentCreationStatus': self.poll_request(params['AccountAssignmentCreationRequestId'])}
+
+    def sso_admin__DescribeAccountAssignmentDeletionStatus(self, params):
+        return {'AccountAssignmentDeletionStatus': self.poll_request(params['AccountAssignmentDeletionRequestId'])}
+
+    # ---- organizations
+
+    def organizations__DescribeOrganization(self, params):
+        return {'Organization': {'Id': 'o-0000000000', 'MasterAccountId': self.managementAccount}}
+
+    def organizations__ListRoots(self, params):
+        return {'Roots': [{'Id': self.rootId, 'Name': 'Root'}]}
+
+    def organizations__ListAccounts(self, params):
+        accounts = [{'Id': account, 'Name': account, 'Status': value['Status']} for account, value in sorted(self.accounts.items())]
+        return self.page(accounts, params, 'Accounts', 20)
+
+    def organizations__ListAccountsForParent(self, params):
+        accounts = [{'Id': account, 'Name': account, 'Status': value['Status']} for account, value in sorted(self.accounts.items()) if value['Parent'] == params['ParentId']]
+        return self.page(accounts, params, 'Accounts', 20)
+
+    def organizations__ListOrganizationalUnitsForParent(self, params):
+        ous = [{'Id': ou, 'Name': ou} for ou, parent in sorted(self.ous.items()) if parent == params['ParentId']]
+        return self.page(ous, params, 'OrganizationalUnits', 20)
+
+    def organizations__ListParents(self, params):
+        child = params['ChildId']
+        parent = self.accounts[child]['Parent'] if child in self.accounts else self.ous.get(child)
+        if parent is None:
+            return error('ChildNotFoundException', 400)
+        return {'Parents': [{'Id': parent, 'Type': 'ROOT' if parent == self.rootId else 'ORGANIZATIONAL_UNIT'}]}
+
+    def organizations__ListChildren(self, params):
+        if params['ChildType'] == 'ACCOUNT':
+            children = [{'Id': account, 'Type': 'ACCOUNT'} for account, value in sorted(self.accounts.items()) if value['Parent'] == params['ParentId']]
+        else:
+            children = [{'Id': ou, 'Type': 'ORGANIZATIONAL_UNIT'} for ou, parent in sorted(self.ous.items()) if parent == params['ParentId']]
+        return self.page(children, params, 'Children', 20)
+
+    # ---- identitystore
+
+    def identitystore__ListGroups(self, params):
+        groups = [{'GroupId': groupId, 'DisplayName': name, 'IdentityStoreId': self.identityStoreId} for name, groupId in sorted(self.groups.items())]
+        for eachFilter in params.get('Filters', []):
+            groups = [group for group in groups if group['DisplayName'] == eachFilter['AttributeValue']]
+        return self.page(groups, params, 'Groups')
+
+    def identitystore__ListUsers(self, params):
+        users = [{'UserId': userId, 'UserName': name, 'IdentityStoreId': self.identityStoreId} for name, userId in sorted(self.users.items())]
+        for eachFilter in params.get('Filters', []):
+            users = [user for user in users if user['UserName'] == eachFilter['AttributeValue']]
+        return self.page(users, params, 'Users')
+
+    # ---- iam and accessanalyzer
+
+    def iam__GetPolicy(self, params):
+        if not params['PolicyArn'].startswith('arn:aws:iam::aws:policy/'):
+            return error('NoSuchEntity', 404)
+        return {'Policy': {'Arn': params['PolicyArn'], 'PolicyName': params['PolicyArn'].split('/')[-1]}}
+
+    def iam__ListPolicies(self, params):
+        return {'Policies': [], 'IsTruncated': False}
+
+    def accessanalyzer__ValidatePolicy(self, params):
+        return {'findings': []}
+
+def error(code, status):
+    return {'Error': {'Code': code, 'Message': f'{code} (stand-in)'}, 'Status': status}
+
+# Serializes a response for the query protocol (IAM). Lists use the <member> wrapper
+def to_xml(value):
+    if isinstance(value, dict):
+        return ''.join(f'<{key}>{to_xml(item)}</{key}>' for key, item in value.items())
+    if isinstance(value, list):
+        return ''.join(f'<member>{to_xml(item)}</member>' for item in value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return escape(str(value))
+
+def serialize(operationModel, response):
+    protocol = operationModel.metadata['protocol']
+    status = response.get('Status', 200) if 'Error' in response else 200
+    if protocol == 'query':
+        operation = operationModel.name
+        if 'Error' in response:
+            body = f"<ErrorResponse><Error><Type>Sender</Type>{to_xml(response['Error'])}</Error><RequestId>0</RequestId></ErrorResponse>"
+        else:
+            body = f'<{operation}Response><{operation}Result>{to_xml(response)}</{operation}Result></{operation}Response>'
+        return status, {'Content-Type': 'text/xml'}, body.encode('utf-8')
+
+    if 'Error' in response:
+        response = {'__type': response['Error']['Code'], 'message': response['Error']['Message']}
+    return status, {'Content-Type': 'application/x-amz-json-1.1'}, json.dumps(response).encode('utf-8')
+
+# Routes every call made with the session (by default the boto3 default session, used by the scripts) to the stand-in
+def install(standIn, session=None):
+    if session is None:
+        boto3.setup_default_session(region_name='us-east-1', aws_access_key_id='standin', aws_secret_access_key='standin')
+        session = boto3.DEFAULT_SESSION
+
+    def remember_call(params, model, **kwargs):
+        currentCall.value = (model, dict(params))
+
+    def answer(request, **kwargs):
+        model, params = currentCall.value
+        response = standIn.handle(model.service_model.service_name, model.name, params)
+        status, headers, body = serialize(model, response)
+        return AWSResponse(request.url, status, headers, StandInBody(body))
+
+    session.events.register('before-parameter-build', remember_call)
+    session.events.register('before-send', answer)
+    return session
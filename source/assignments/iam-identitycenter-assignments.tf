@@ -25,8 +25,14 @@ terraform {
   }
 }
 
+# File applied with this state. With --shards, each shard (assignments-0.json, assignments-1.json, ...) has its own state
+variable "assignments_file" {
+  type    = string
+  default = "assignments.json"
+}
+
 locals {
-  assignment_file = jsondecode(file("assignments.json"))
+  assignment_file = jsondecode(file(var.assignments_file))
 }
 
 resource "aws_ssoadmin_account_assignment" "assignment" {
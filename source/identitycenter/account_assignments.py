@@ -0,0 +1,118 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Account Assignments Reconciler
+## +-----------------------------------
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from identitycenter import provisioning
+
+log = logging.getLogger(__name__)
+
+# Number of parallel list, create and delete calls
+DEFAULT_WORKERS = 10
+
+# Tracks create_account_assignment and delete_account_assignment requests. Labels are ('CREATE' or 'DELETE', key).
+class AssignmentRequestTracker(provisioning.ProvisioningTracker):
+    requestType = 'account assignment'
+
+    def describe(self, label, requestId):
+        if label[0] == 'CREATE':
+            response = self.client.describe_account_assignment_creation_status(
+                InstanceArn=self.instanceArn,
+                AccountAssignmentCreationRequestId=requestId
+            )
+            return response['AccountAssignmentCreationStatus']
+        response = self.client.describe_account_assignment_deletion_status(
+            InstanceArn=self.instanceArn,
+            AccountAssignmentDeletionRequestId=requestId
+        )
+        return response['AccountAssignmentDeletionStatus']
+
+def list_provisioned_accounts(client, instanceArn, permissionSetArn):
+    accounts = []
+    paginator = client.get_paginator('list_accounts_for_provisioned_permission_set')
+    for page in paginator.paginate(InstanceArn=instanceArn, PermissionSetArn=permissionSetArn):
+        accounts.extend(page['AccountIds'])
+    return accounts
+
+def list_assignments_in_account(client, instanceArn, permissionSetArn, accountId):
+    keys = []
+    paginator = client.get_paginator('list_account_assignments')
+    for page in paginator.paginate(InstanceArn=instanceArn, AccountId=accountId, PermissionSetArn=permissionSetArn):
+        for eachAssignment in page['AccountAssignments']:
+            keys.append((eachAssignment['AccountId'], eachAssignment['PermissionSetArn'], eachAssignment['PrincipalType'], eachAssignment['PrincipalId']))
+    return keys
+
+# Returns the set of keys of the current account assignments of the given permission sets. Only these permission sets
+# are listed, so assignments of permission sets not managed by the pipeline are never read nor changed.
+def list_current_assignments(client, instanceArn, permissionSetArns, workers=DEFAULT_WORKERS):
+    current = set()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        accountFutures = {executor.submit(list_provisioned_accounts, client, instanceArn, eachArn): eachArn for eachArn in set(permissionSetArns)}
+        assignmentFutures = []
+        for future in as_completed(accountFutures):
+            for eachAccount in future.result():
+                assignmentFutures.append(executor.submit(list_assignments_in_account, client, instanceArn, accountFutures[future], eachAccount))
+        for future in as_completed(assignmentFutures):
+            current.update(future.result())
+    log.info(f"{len(current)} account assignments found for {len(set(permissionSetArns))} permission sets")
+    return current
+
+# Returns the sorted lists of keys to create and to delete. Assignments in protected accounts (e.g. the management account) are never deleted.
+def diff_assignments(currentAssignments, desiredAssignments, protectedAccounts=()):
+    toCreate = sorted(desiredAssignments - currentAssignments)
+    toDelete = sorted(eachKey for eachKey in currentAssignments - desiredAssignments if eachKey[0] not in protectedAccounts)
+    return toCreate, toDelete
+
+def request_assignment_change(client, instanceArn, action, key):
+    parameters = {
+        'InstanceArn': instanceArn,
+        'TargetId': key[0],
+        'TargetType': 'AWS_ACCOUNT',
+        'PermissionSetArn': key[1],
+        'PrincipalType': key[2],
+        'PrincipalId': key[3]
+    }
+    if action == 'CREATE':
+        return client.create_account_assignment(**parameters)['AccountAssignmentCreationStatus']
+    return client.delete_account_assignment(**parameters)['AccountAssignmentDeletionStatus']
+
+# Creates and deletes the account assignments in parallel and waits for all the requests to finish.
+# Returns a dictionary by ('CREATE' or 'DELETE', key) with Status SUCCEEDED, FAILED or TIMED_OUT.
+def apply_assignment_changes(client, instanceArn, toCreate, toDelete, workers=DEFAULT_WORKERS, timeout=900):
+    tracker = AssignmentRequestTracker(client, instanceArn)
+    changes = [('CREATE', eachKey) for eachKey in toCreate] + [('DELETE', eachKey) for eachKey in toDelete]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(request_assignment_change, client, instanceArn, action, key): (action, key) for action, key in changes}
+        for future in as_completed(futures):
+            try:
+                tracker.add(futures[future], future.result())
+            except Exception as error:
+                tracker.results[futures[future]] = {'RequestId': '', 'Status': 'FAILED', 'FailureReason': str(error)}
+
+    return tracker.wait(timeout, workers)
+
+# Logs one aggregated report and returns the number of changes that didn't succeed
+def report_assignment_results(results):
+    failed = {label: result for label, result in results.items() if result['Status'] != 'SUCCEEDED'}
+    log.info(f"{len(results) - len(failed)} of {len(results)} account assignment changes succeeded")
+    for (action, key) in sorted(failed):
+        log.error(f"[ACCOUNT: {key[0]}] [{key[2]}: {key[3]}] {action} of {key[1]} {failed[(action, key)]['Status']}: " + failed[(action, key)]['FailureReason'])
+    return len(failed)
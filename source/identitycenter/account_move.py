@@ -0,0 +1,89 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Account Move Delta
+## +-----------------------------------
+
+import logging
+
+from identitycenter import targets
+
+log = logging.getLogger(__name__)
+
+# Returns the account, the source parent and the destination parent of a MoveAccount event. The event can be the
+# EventBridge event of the rule (detail-type 'AWS API Call via CloudTrail') or only its CloudTrail record (detail).
+def parse_move_event(event):
+    detail = event.get('detail', event)
+    if detail.get('eventName') != 'MoveAccount':
+        raise ValueError(f"Expected a MoveAccount event, not {detail.get('eventName')}")
+    if detail.get('errorCode'):
+        raise ValueError(f"The MoveAccount call failed ({detail['errorCode']}), so the account didn't move")
+    parameters = detail.get('requestParameters') or {}
+    for eachParameter in ('accountId', 'sourceParentId', 'destinationParentId'):
+        if not parameters.get(eachParameter):
+            raise ValueError(f"The MoveAccount event has no requestParameters.{eachParameter}")
+    return {
+        'AccountId': parameters['accountId'],
+        'SourceParentId': parameters['sourceParentId'],
+        'DestinationParentId': parameters['destinationParentId']
+    }
+
+# Parents of a parent (OU or root) up to the root, starting with the parent itself, from an OrganizationIndex
+def parent_chain_from_index(index, parentId):
+    parents = {child: parent for parent, children in index.children.items() for child in children}
+    chain = [parentId]
+    while chain[-1] != index.rootId:
+        if chain[-1] not in parents:
+            raise ValueError(f"Organizational unit {chain[-1]} was not found in the organization")
+        chain.append(parents[chain[-1]])
+    return chain
+
+# Same as parent_chain_from_index, asking AWS Organizations (one call per level)
+def parent_chain_from_api(client, parentId):
+    chain = [parentId]
+    while not chain[-1].startswith('r-'):
+        chain.append(client.list_parents(ChildId=chain[-1])['Parents'][0]['Id'])
+    return chain
+
+# Returns the assignment templates whose targets cover the account (see targets.targets_cover)
+def assignments_covering_account(assignments, accountId, chain):
+    return [eachAssignment for eachAssignment in assignments if targets.targets_cover(eachAssignment['Target'], accountId, chain)]
+
+# Computes the assignments to create and to delete for an account that moved from the source to the destination parent.
+# Targets that name the account, or the root, cover it in both places, so only OU targets (included or excluded) can change the result.
+# Keys are (AccountId, PermissionSetArn, PrincipalType, PrincipalId), as in account_assignments.
+def move_delta(assignments, accountId, sourceChain, destinationChain, principalIds, permissionSetArns):
+    def keys(chain):
+        return {
+            (accountId, permissionSetArns[eachAssignment['PermissionSetName']], eachAssignment['PrincipalType'],
+                principalIds[(eachAssignment['PrincipalId'], eachAssignment['PrincipalType'])])
+            for eachAssignment in assignments_covering_account(assignments, accountId, chain)
+        }
+    before = keys(sourceChain)
+    after = keys(destinationChain)
+    return sorted(after - before), sorted(before - after)
+
+# Moves the account in a cached organization index (see OrganizationIndex.to_dict). Returns False if the index
+# doesn't know one of the parents, in which case it should be crawled again.
+def patch_organization_index(indexData, accountId, sourceParentId, destinationParentId):
+    accounts = indexData['Accounts']
+    if sourceParentId not in accounts or destinationParentId not in accounts:
+        return False
+    if accountId in accounts[sourceParentId]:
+        accounts[sourceParentId].remove(accountId)
+    if accountId not in accounts[destinationParentId]:
+        accounts[destinationParentId].append(accountId)
+    return True
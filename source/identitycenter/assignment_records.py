@@ -0,0 +1,117 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Resolved Assignment Records
+## +-----------------------------------
+
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+
+# Sid formats of assignments.json. The Sid is the for_each key of the assignments in Terraform (and their key in the state)
+#   legacy: account ID, principal name, principal type and permission set name concatenated (up to ~150 characters)
+#   short: the first SHORT_SID_LENGTH hexadecimal characters of the SHA-256 of the same fields, separated
+SID_FORMATS = ['legacy', 'short']
+SHORT_SID_LENGTH = 16
+
+# Fields that partition the assignments into shards (see --shard-by). Account IDs and permission set names don't change,
+# so an assignment stays in the same shard from run to run, and a new account or permission set doesn't move the others
+SHARD_KEYS = {
+    'account': 'Target',
+    'permission-set': 'PermissionSetName'
+}
+
+# Address of the assignments in iam-identitycenter-assignments.tf, used in the moved blocks
+TERRAFORM_RESOURCE = 'aws_ssoadmin_account_assignment.assignment'
+
+# One resolved assignment. A tuple has no per-record dictionary, and the strings repeated by many records
+# (principal and permission set names, IDs and ARNs) are interned, so each record only holds references
+AssignmentRecord = namedtuple('AssignmentRecord', ['Target', 'PrincipalName', 'PrincipalType', 'PermissionSetName', 'PrincipalId', 'PermissionSetArn'])
+
+def new_record(target, principalName, principalType, permissionSetName, principalId, permissionSetArn):
+    return AssignmentRecord(sys.intern(target), sys.intern(principalName), sys.intern(principalType), sys.intern(permissionSetName),
+        sys.intern(principalId), sys.intern(permissionSetArn))
+
+def legacy_sid(record):
+    return str(record.Target)+str(record.PrincipalName)+str(record.PrincipalType)+str(record.PermissionSetName)
+
+# Stable as long as the account, principal and permission set of the assignment don't change
+def short_sid(record):
+    identity = f"{record.Target}|{record.PrincipalName}|{record.PrincipalType}|{record.PermissionSetName}"
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()[:SHORT_SID_LENGTH]
+
+# Raised when two different assignments get the same short Sid
+class SidCollision(Exception):
+    pass
+
+# Gives each record its Sid and skips the records with a Sid that was already seen (e.g. an account in two overlapping OUs).
+# Two different assignments with the same short Sid would overwrite each other in Terraform, so they raise SidCollision.
+class SidRegistry:
+    def __init__(self, sidFormat='legacy'):
+        self.sid = short_sid if sidFormat == 'short' else legacy_sid
+        self.checkCollisions = sidFormat == 'short'
+        self.seen = {}
+
+    # Returns the Sid of the record, or None if the record was already seen
+    def register(self, record):
+        sid = self.sid(record)
+        identity = record[:4]
+        previous = self.seen.get(sid)
+        if previous is None:
+            self.seen[sid] = identity
+            return sid
+        if self.checkCollisions and previous != identity:
+            raise SidCollision(f"The assignments {'|'.join(previous)} and {'|'.join(identity)} have the same Sid {sid}")
+        return None
+
+# Record in the format of assignments.json
+def to_json(sid, record):
+    return json.dumps({
+        "Sid": sid,
+        "PrincipalId": record.PrincipalId,
+        "PrincipalType": record.PrincipalType,
+        "PermissionSetName": record.PermissionSetArn,
+        "Target": record.Target
+    })
+
+# Terraform string literal: JSON escapes plus the template sequences ${ and %{
+def terraform_string(value):
+    return json.dumps(value).replace('${', '$${').replace('%{', '%%{')
+
+# moved block that renames the state of an assignment from its legacy Sid to its new Sid
+def moved_block(record, sid):
+    return (f"moved {{\n  from = {TERRAFORM_RESOURCE}[{terraform_string(legacy_sid(record))}]\n"
+        f"  to   = {TERRAFORM_RESOURCE}[{terraform_string(sid)}]\n}}\n")
+
+# Key of the record as compared with the current assignments: (AccountId, PermissionSetArn, PrincipalType, PrincipalId)
+def record_key(record):
+    return (record.Target, record.PermissionSetArn, record.PrincipalType, record.PrincipalId)
+
+# Shard (0 to shards - 1) of the record, from the hash of its account or permission set name
+def shard_of(record, shards, shardBy='account'):
+    if shards <= 1:
+        return 0
+    key = getattr(record, SHARD_KEYS[shardBy])
+    return int(hashlib.sha256(key.encode('utf-8')).hexdigest()[:8], 16) % shards
+
+# File of a shard: assignments.json with one shard, assignments-0.json, assignments-1.json, ... with several
+def shard_path(path, index, shards):
+    if shards <= 1:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}-{index}{extension}"
@@ -0,0 +1,459 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Assignments Managemnet
+## +-----------------------------------
+
+import argparse
+import json
+import os
+import logging
+import traceback
+
+from identitycenter import account_assignments
+from identitycenter import account_move
+from identitycenter import assignment_records
+from identitycenter import cache
+from identitycenter import clients
+from identitycenter import discovery
+from identitycenter import metrics
+from identitycenter import organization
+from identitycenter import principals
+from identitycenter import targets
+from identitycenter import templates
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 10
+
+# Raised while the assignments are generated. The stage reports it and stops after removing the partial outputs
+class AssignmentError(Exception):
+    pass
+
+# Arguments of the assignments stage
+def add_arguments(parser):
+    parser.add_argument('--mgmt_account', action="store", dest='mgmtAccount')
+    parser.add_argument('--assignments-file', action="store", dest='assignmentsFile', default='assignments.json',
+        help='File where the resolved assignments are written for Terraform. Default: %(default)s')
+    add_cache_arguments(parser)
+    parser.add_argument('--apply', action="store_true", dest='apply',
+        help='Create and delete the account assignments directly in AWS SSO instead of leaving it to Terraform')
+    parser.add_argument('--assignment-timeout', action="store", dest='assignmentTimeout', type=int, default=900,
+        help='Seconds to wait for the account assignment requests made by --apply to finish. Default: %(default)s')
+    parser.add_argument('--move-event', action="store", dest='moveEvent',
+        help='MoveAccount event (JSON file, as sent by the EventBridge rule). Only the assignments of the moved account that change are computed and written to --delta-file (and applied with --apply)')
+    parser.add_argument('--delta-file', action="store", dest='deltaFile', default='assignments-delta.json',
+        help='File where the assignment changes of --move-event are written. Default: %(default)s')
+    parser.add_argument('--sid-format', action="store", dest='sidFormat', choices=assignment_records.SID_FORMATS, default='legacy',
+        help='Sid of the assignments in the assignments file (the key of each assignment in the Terraform state). short is a 16 character hash '
+            + 'of the account, principal and permission set. Default: %(default)s')
+    parser.add_argument('--moved-file', action="store", dest='movedFile',
+        help='Terraform file where a moved block is written for each assignment, from its legacy Sid to its --sid-format Sid, '
+            + 'so the assignments already in the state are renamed instead of being deleted and created again')
+    parser.add_argument('--shards', action="store", dest='shards', type=int, default=1,
+        help='Number of files the assignments are split into (assignments-0.json, assignments-1.json, ...), each one applied by Terraform with its own state. Default: %(default)s')
+    parser.add_argument('--shard-by', action="store", dest='shardBy', choices=sorted(assignment_records.SHARD_KEYS), default='account',
+        help='Whether the assignments are split by the hash of their account or of their permission set name. Default: %(default)s')
+
+# Arguments of the organization and principal cache, also used by the drift command
+def add_cache_arguments(parser):
+    parser.add_argument('--cache-file', action="store", dest='cacheFile',
+        help='JSON file that keeps the organization and principal lookups between runs (e.g. in the CodeBuild cache directory). Disabled by default')
+    parser.add_argument('--cache-organization-ttl', action="store", dest='cacheOrganizationTtl', type=int, default=cache.DEFAULT_TTLS['organization'],
+        help='Seconds a cached organization is used before it is crawled again. Default: %(default)s')
+    parser.add_argument('--cache-principal-ttl', action="store", dest='cachePrincipalTtl', type=int, default=cache.DEFAULT_TTLS['principals'],
+        help='Seconds a cached principal ID is used before it is looked up again. Default: %(default)s')
+    parser.add_argument('--refresh-cache', action="store_true", dest='refreshCache',
+        help='Ignore the cached values and fetch everything again. The cache file is still updated')
+
+# This method will return all permission sets in AWS SSO with the tag 'SSOPipeline'
+def get_current_permissionset_list():
+    client = clients.get_client('sso-admin')
+    permissionSetIndex = discovery.get_managed_permission_sets(client, ssoInstanceArn)
+    return permissionSetIndex['Arns']
+
+def load_assignments_from_file():
+    assigments_file, errors = templates.load_assignment_files(args.asFolder, args.workers)
+    if templates.report_errors(errors) > 0:
+        log.error("There are assignment templates with errors. Please check your templates.")
+        exit (1)
+
+    assig_dic = {}
+    assignments_list = []
+    for eachFile in assigments_file:
+        assignments_list.extend(assigments_file[eachFile]['Assignments'])
+    assig_dic['Assignments'] = assignments_list
+    log.info('Assignments successfully loaded from repository files')
+    return assig_dic
+
+
+
+# The organization is crawled only once per run, the first time an OU or Root target needs to be resolved
+def get_organization_index():
+    global organizationIndex
+    if organizationIndex is None:
+        cachedIndex = persistentCache.get('organization', 'index') if persistentCache else None
+        if cachedIndex is not None:
+            log.info('Organization loaded from cache')
+            organizationIndex = organization.OrganizationIndex.from_dict(cachedIndex)
+        else:
+            client = clients.get_client('organizations')
+            with metrics.phase('organization-crawl'):
+                organizationIndex = organization.build_organization_index(client, args.workers)
+            if persistentCache:
+                persistentCache.put('organization', 'index', organizationIndex.to_dict())
+    return organizationIndex
+
+# Resolves every distinct principal of the assignment files at once. If any principal is not found, all of them are
+# reported together and the script stops before the assignment file is written.
+def resolve_principal_ids(repositoryAssignments):
+    client = clients.get_client('identitystore')
+    principalList = [(assignment['PrincipalId'], assignment['PrincipalType']) for assignment in repositoryAssignments['Assignments']]
+
+    try:
+        with metrics.phase('principal-lookup'):
+            principalIds, unresolved = principals.resolve_principals(client, identitystore, principalList, args.workers, persistentCache=persistentCache)
+    except Exception as error:
+        log.error("It was not possible to lookup principals. Reason: " + str(error))
+        log.error(traceback.format_exc())
+        exit (1)
+
+    if unresolved:
+        for principalName, principalType in unresolved:
+            log.error(f"[PR: {principalName}] [{principalType}] Principal was not found in the Identity Store")
+        log.error(f"{len(unresolved)} principals could not be resolved. The assignment file was not created.")
+        exit (1)
+
+    return principalIds
+
+# Resolves the targets of an assignment template with the target engine (see targets.py): overlapping targets
+# don't produce duplicates, targets starting with ! are removed and the management account is never returned
+def resolve_targets(eachCurrentAssignments):
+    try:
+        log.info(f"[SID: {eachCurrentAssignments['SID']}] Resolving target in accounts")
+        return targetEngine.resolve(eachCurrentAssignments['Target'])
+    except Exception as error:
+        raise AssignmentError(f"[SID: {eachCurrentAssignments['SID']}] It was not possible to resolve the targets from assignment. Reason: " + str(error)) from error
+
+
+# Stops the script if a permission set of the assignment templates is not in AWS SSO, listing every missing one
+def check_permission_sets(permissionSetsArn, repositoryAssignments):
+    missing = sorted({assignment['PermissionSetName'] for assignment in repositoryAssignments['Assignments'] if assignment['PermissionSetName'] not in permissionSetsArn})
+    if missing:
+        for permissionSetName in missing:
+            log.error(f"[PS: {permissionSetName}] Permission set of an assignment template was not found in AWS SSO")
+        log.error(f"{len(missing)} permission sets could not be found. The assignment file was not created.")
+        exit (1)
+
+# Yields one assignment record for each account resolved from the targets of each assignment template.
+# The principal IDs are resolved before (see resolve_principal_ids), and nothing is kept in memory,
+# so the records can be written while they are generated.
+def create_assignment_file(permissionSetsArn,repositoryAssignments,principalIds):
+    log.info('Creating assignment file')
+    
+    for assignment in repositoryAssignments['Assignments']:
+        accounts = resolve_targets(assignment)
+        try:
+            principalId = principalIds[(assignment['PrincipalId'], assignment['PrincipalType'])]
+            permissionSetArn = permissionSetsArn[assignment['PermissionSetName']]
+        except KeyError as error:
+            raise AssignmentError(f"[SID: {assignment['SID']}] The principal or permission set {error} was not resolved") from error
+        
+        for eachAccount in accounts:
+            yield assignment_records.new_record(str(eachAccount), str(assignment['PrincipalId']), str(assignment['PrincipalType']),
+                str(assignment['PermissionSetName']), principalId, permissionSetArn)
+
+# Yields (Sid, record) for each assignment, skipping the ones with a Sid that was already seen (e.g. an account in two overlapping OUs).
+# Raises AssignmentError if two different assignments get the same short Sid.
+def deduplicate_assignments(assignments, sidFormat='legacy'):
+    registry = assignment_records.SidRegistry(sidFormat)
+    for eachAssignment in assignments:
+        try:
+            sid = registry.register(eachAssignment)
+        except assignment_records.SidCollision as error:
+            raise AssignmentError(str(error) + ". Use --sid-format legacy.") from error
+        if sid is not None:
+            yield sid, eachAssignment
+
+# Adds the key of each assignment to the set while passing the assignments along
+def collect_assignment_keys(assignments, keys):
+    for sid, eachAssignment in assignments:
+        keys.add(assignment_records.record_key(eachAssignment))
+        yield sid, eachAssignment
+
+# Writes a moved block for each assignment whose Sid is not the legacy one while passing the assignments along.
+# Terraform ignores the moved blocks of addresses that are not in the state, so the file can be kept from run to run.
+def write_moved_blocks(assignments, movedFile):
+    for sid, eachAssignment in assignments:
+        if sid != assignment_records.legacy_sid(eachAssignment):
+            movedFile.write(assignment_records.moved_block(eachAssignment, sid))
+        yield sid, eachAssignment
+
+# Writes the (Sid, record) assignments to the files of their shards one by one, as JSON lists. The records go to temporary files
+# that are renamed at the end, so Terraform never reads a partial file. If anything fails in the middle, the temporary files are removed.
+# Every shard file is written, even if empty, so Terraform removes the assignments that are no longer in a shard.
+def write_assignment_file(assignments, path='assignments.json', shards=1, shardBy='account'):
+    counts = [0] * shards
+    paths = [assignment_records.shard_path(path, index, shards) for index in range(shards)]
+    files = []
+    try:
+        for eachPath in paths:
+            files.append(open(eachPath + '.tmp', 'w'))
+            files[-1].write('[')
+        for sid, eachAssignment in assignments:
+            index = assignment_records.shard_of(eachAssignment, shards, shardBy)
+            if counts[index] > 0:
+                files[index].write(',')
+            files[index].write(assignment_records.to_json(sid, eachAssignment))
+            counts[index] += 1
+        for eachFile in files:
+            eachFile.write(']')
+            eachFile.close()
+        for eachPath in paths:
+            os.replace(eachPath + '.tmp', eachPath)
+    finally:
+        for eachFile in files:
+            eachFile.close()
+        remove_temporary_files(eachPath + '.tmp' for eachPath in paths)
+    return counts
+
+# Writes the assignment files and, with --moved-file, the moved blocks, which are also renamed only when everything was written
+def write_assignment_outputs(assignments):
+    if not args.movedFile:
+        return write_assignment_file(assignments, args.assignmentsFile, args.shards, args.shardBy)
+
+    temporaryPath = args.movedFile + '.tmp'
+    try:
+        with open(temporaryPath, 'w') as movedFile:
+            counts = write_assignment_file(write_moved_blocks(assignments, movedFile), args.assignmentsFile, args.shards, args.shardBy)
+        os.replace(temporaryPath, args.movedFile)
+    finally:
+        remove_temporary_files([temporaryPath])
+    return counts
+
+# Removes the temporary files left by a write that didn't finish (renamed files are already gone)
+def remove_temporary_files(paths):
+    for eachPath in paths:
+        if os.path.exists(eachPath):
+            os.remove(eachPath)
+
+# Compares the resolved assignments with the current assignments of the permission sets managed by the pipeline,
+# and creates and deletes only the differences. This is an alternative to applying assignments.json with Terraform.
+def apply_assignments(desiredAssignments):
+    client = clients.get_client('sso-admin')
+
+    try:
+        currentAssignments = account_assignments.list_current_assignments(client, ssoInstanceArn, permissionSetsArn.values(), args.workers)
+    except Exception as error:
+        log.error("It was not possible to list the current account assignments. Reason: " + str(error))
+        log.error(traceback.format_exc())
+        exit (1)
+
+    toCreate, toDelete = account_assignments.diff_assignments(currentAssignments, desiredAssignments, protectedAccounts={managementAccount})
+    log.info(f"{len(toCreate)} account assignments to create and {len(toDelete)} to delete")
+
+    results = account_assignments.apply_assignment_changes(client, ssoInstanceArn, toCreate, toDelete, args.workers, args.assignmentTimeout)
+    if account_assignments.report_assignment_results(results) > 0:
+        exit (1)
+
+# Returns the parents of the source and destination of the move, up to the root. The cached organization is used
+# when it knows both parents, otherwise AWS Organizations is asked for the parents of each level (no full crawl).
+def get_move_parent_chains(move):
+    cachedIndex = persistentCache.get('organization', 'index') if persistentCache else None
+    if cachedIndex is not None:
+        index = organization.OrganizationIndex.from_dict(cachedIndex)
+        try:
+            return account_move.parent_chain_from_index(index, move['SourceParentId']), account_move.parent_chain_from_index(index, move['DestinationParentId'])
+        except ValueError as error:
+            log.info('The cached organization is not up to date, so the parents are listed in AWS Organizations. Reason: ' + str(error))
+
+    client = clients.get_client('organizations')
+    return account_move.parent_chain_from_api(client, move['SourceParentId']), account_move.parent_chain_from_api(client, move['DestinationParentId'])
+
+# Writes the changes of a move as two lists of records in the format of assignments.json
+def write_delta_file(move, toCreate, toDelete, path):
+    def record(key):
+        return {"PrincipalId": key[3], "PrincipalType": key[2], "PermissionSetName": key[1], "Target": key[0]}
+    delta = {
+        'AccountId': move['AccountId'],
+        'SourceParentId': move['SourceParentId'],
+        'DestinationParentId': move['DestinationParentId'],
+        'Create': [record(eachKey) for eachKey in toCreate],
+        'Delete': [record(eachKey) for eachKey in toDelete]
+    }
+    with open(path, 'w') as f:
+        json.dump(delta, f, indent=4)
+
+# Handles a MoveAccount event: only the assignment templates whose targets cover the account before or after the move
+# are resolved, and only the assignments of that account that change are written (and applied with --apply).
+# The cached organization is updated with the new parent of the account, so the next full run doesn't use a stale tree.
+def process_account_move(repositoryAssignments):
+    try:
+        with open(args.moveEvent) as f:
+            move = account_move.parse_move_event(json.load(f))
+    except (OSError, ValueError) as error:
+        log.error(f"It was not possible to read the event {args.moveEvent}. Reason: " + str(error))
+        exit (1)
+
+    accountId = move['AccountId']
+    log.info(f"[ACCOUNT: {accountId}] Account moved from {move['SourceParentId']} to {move['DestinationParentId']}")
+    if accountId == managementAccount:
+        log.info(f"[ACCOUNT: {accountId}] Assignments in the management account are not managed by the pipeline. Nothing to do.")
+        return
+
+    try:
+        with metrics.phase('parent-lookup'):
+            sourceChain, destinationChain = get_move_parent_chains(move)
+    except Exception as error:
+        log.error("It was not possible to find the parents of the account. Reason: " + str(error))
+        log.error(traceback.format_exc())
+        exit (1)
+
+    assignments = repositoryAssignments['Assignments']
+    try:
+        relevantAssignments = {eachAssignment['SID']: eachAssignment for eachAssignment in
+            account_move.assignments_covering_account(assignments, accountId, sourceChain) + account_move.assignments_covering_account(assignments, accountId, destinationChain)}
+    except ValueError as error:
+        log.error(f"[ACCOUNT: {accountId}] It was not possible to evaluate the targets. Reason: " + str(error))
+        exit (1)
+    log.info(f"[ACCOUNT: {accountId}] {len(relevantAssignments)} of {len(assignments)} assignment templates cover the account before or after the move")
+    principalIds = resolve_principal_ids({'Assignments': list(relevantAssignments.values())})
+
+    try:
+        toCreate, toDelete = account_move.move_delta(list(relevantAssignments.values()), accountId, sourceChain, destinationChain, principalIds, permissionSetsArn)
+    except KeyError as error:
+        log.error(f"[ACCOUNT: {accountId}] The permission set {error} of an assignment template was not found in AWS SSO")
+        exit (1)
+    write_delta_file(move, toCreate, toDelete, args.deltaFile)
+    log.info(f"[ACCOUNT: {accountId}] {len(toCreate)} assignments to create and {len(toDelete)} to delete, written to {args.deltaFile}")
+
+    if args.apply and (toCreate or toDelete):
+        client = clients.get_client('sso-admin')
+        with metrics.phase('apply'):
+            # Only the assignments of this account and of the permission sets that change are listed
+            current = set()
+            for eachArn in sorted({eachKey[1] for eachKey in toCreate + toDelete}):
+                current.update(account_assignments.list_assignments_in_account(client, ssoInstanceArn, eachArn, accountId))
+            results = account_assignments.apply_assignment_changes(client, ssoInstanceArn,
+                [eachKey for eachKey in toCreate if eachKey not in current], [eachKey for eachKey in toDelete if eachKey in current],
+                args.workers, args.assignmentTimeout)
+        if account_assignments.report_assignment_results(results) > 0:
+            exit (1)
+
+    if persistentCache:
+        cachedIndex = persistentCache.get('organization', 'index')
+        if cachedIndex is not None and account_move.patch_organization_index(cachedIndex, accountId, move['SourceParentId'], move['DestinationParentId']):
+            persistentCache.patch('organization', 'index', cachedIndex)
+            log.info(f"[ACCOUNT: {accountId}] Account moved in the cached organization")
+
+# Sets up what is needed to resolve the assignment templates: the arguments, the instance, the target engine and the cache.
+# Used by run and by the drift command
+def initialize(arguments, state):
+    # Put arguments in a global variable to be used latter on in the code
+    global args
+    global ssoInstanceArn
+    global identitystore
+    global managementAccount
+    global organizationIndex
+    global persistentCache
+    global targetEngine
+    organizationIndex = None
+    args = argparse.Namespace(**vars(arguments))
+    if args.workers is None:
+        args.workers = DEFAULT_WORKERS
+
+    managementAccount = args.mgmtAccount
+    targetEngine = targets.TargetEngine(get_organization_index, excludedAccounts=[managementAccount])
+
+    # Get Identity Store and SSO Instance ARN
+    instance = state.instance()
+    ssoInstanceArn = instance['InstanceArn']
+    identitystore = instance['IdentityStoreId']
+
+    persistentCache = None
+    if args.cacheFile:
+        persistentCache = cache.PersistentCache(
+            args.cacheFile,
+            scope=f"{ssoInstanceArn}|{identitystore}",
+            ttls={'organization': args.cacheOrganizationTtl, 'principals': args.cachePrincipalTtl},
+            refresh=args.refreshCache
+        )
+
+# Runs the assignments stage. When the permission sets stage ran before in the same process, the permission sets
+# it left in AWS SSO are taken from the state instead of being listed again
+def run(arguments, state):
+    print("#######################################")
+    print("# Starting AWS SSO Assignments Script #")
+    print("#######################################\n")
+    
+    global permissionSetsArn
+    initialize(arguments, state)
+    if args.shards < 1:
+        log.error("--shards must be at least 1")
+        exit (1)
+    
+    if state.permissionSetArns is not None:
+        log.info('Using the permission sets left by the permission sets stage')
+        permissionSetsArn = state.permissionSetArns
+    else:
+        with metrics.phase('discovery'):
+            permissionSetsArn = get_current_permissionset_list()
+
+    with metrics.phase('load-templates'):
+        repositoryAssignments = load_assignments_from_file()
+
+    if args.moveEvent:
+        process_account_move(repositoryAssignments)
+        if persistentCache:
+            persistentCache.save()
+        log.info('Account move processed.')
+        return
+
+    # Principals and permission sets are looked up before any output is written. Targets are resolved while the file is written
+    check_permission_sets(permissionSetsArn, repositoryAssignments)
+    principalIds = resolve_principal_ids(repositoryAssignments)
+    assignments = deduplicate_assignments(create_assignment_file(permissionSetsArn,repositoryAssignments,principalIds), args.sidFormat)
+    desiredAssignments = set()
+    if args.apply:
+        assignments = collect_assignment_keys(assignments, desiredAssignments)
+
+    try:
+        with metrics.phase('resolve-and-write'):
+            counts = write_assignment_outputs(assignments)
+    except AssignmentError as error:
+        log.error(str(error))
+        log.error("The assignment file was not created.")
+        exit (1)
+    except Exception as error:
+        log.error("Error: " + str(error))
+        log.error(traceback.format_exc())
+        exit (1)
+    if args.shards > 1:
+        log.info(f"{sum(counts)} assignments written to {args.shards} shards by {args.shardBy} (Sid format: {args.sidFormat}): "
+            + ', '.join(f"{assignment_records.shard_path(args.assignmentsFile, index, args.shards)}: {count}" for index, count in enumerate(counts)))
+    else:
+        log.info(f"{counts[0]} assignments written to {args.assignmentsFile} (Sid format: {args.sidFormat})")
+    if args.movedFile:
+        log.info(f"Moved blocks from the legacy Sids written to {args.movedFile}")
+
+    if args.apply:
+        with metrics.phase('apply'):
+            apply_assignments(desiredAssignments)
+
+    if persistentCache:
+        persistentCache.save()
+    
+    log.info('Association file created.')
@@ -0,0 +1,116 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Pipeline Persistent Cache
+## +-----------------------------------
+
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Increase it when the format of the cached values changes, so old cache files are discarded
+CACHE_VERSION = 1
+
+# Default time to live (seconds) of each section
+DEFAULT_TTLS = {
+    'organization': 3600,
+    'principals': 86400,
+    'policyFindings': 604800,
+    'managedPolicies': 604800
+}
+
+# Optional JSON file that keeps lookups between pipeline runs (e.g. in the CodeBuild cache directory).
+# Each entry is stored with the time it was fetched and is only returned while it is younger than the TTL of its section.
+# Staleness is checked locally, without API calls: a file written by another version of the cache or for another
+# scope (e.g. another Identity Center instance) is ignored as a whole, and refresh=True ignores every entry
+# (new values are still saved).
+class PersistentCache:
+    def __init__(self, path, scope, ttls=None, refresh=False):
+        self.path = path
+        self.scope = scope
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.refresh = refresh
+        self.entries = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            log.info(f"Cache file {self.path} not found. Starting with an empty cache")
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as error:
+            log.warning(f"Cache file {self.path} could not be read and will be ignored. Reason: " + str(error))
+            return
+
+        if data.get('Version') != CACHE_VERSION or data.get('Scope') != self.scope:
+            log.info(f"Cache file {self.path} was written for another version or scope. Ignoring it")
+            return
+        self.entries = data.get('Entries', {})
+
+    # Returns the cached value or None if it doesn't exist, is expired or refresh was requested
+    def get(self, section, key):
+        with self.lock:
+            entry = self.entries.get(section, {}).get(key)
+            if self.refresh or entry is None or time.time() - entry['UpdatedAt'] > self.ttls.get(section, 0):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry['Value']
+
+    def put(self, section, key, value):
+        with self.lock:
+            self.entries.setdefault(section, {})[key] = {'UpdatedAt': time.time(), 'Value': value}
+            self.dirty = True
+
+    # Replaces the value of an entry but keeps the time it was fetched, so the entry expires as before (e.g. after a
+    # change known from an event). Entries that don't exist are not created
+    def patch(self, section, key, value):
+        with self.lock:
+            entry = self.entries.get(section, {}).get(key)
+            if entry is None:
+                return False
+            entry['Value'] = value
+            self.dirty = True
+            return True
+
+    # Writes the cache to a temporary file and renames it, so a failed run never leaves a truncated cache
+    def save(self):
+        with self.lock:
+            log.info(f"Cache: {self.hits} hits and {self.misses} misses")
+            if not self.dirty:
+                return
+            now = time.time()
+            for eachSection in self.entries:
+                self.entries[eachSection] = {key: entry for key, entry in self.entries[eachSection].items() if now - entry['UpdatedAt'] <= self.ttls.get(eachSection, 0)}
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            temporaryPath = self.path + '.tmp'
+            with open(temporaryPath, 'w') as f:
+                json.dump({'Version': CACHE_VERSION, 'Scope': self.scope, 'Entries': self.entries}, f, separators=(',', ':'))
+            os.replace(temporaryPath, self.path)
+            self.dirty = False
+            log.info(f"Cache saved to {self.path}")
@@ -0,0 +1,117 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Pipeline Command Line
+## +-----------------------------------
+
+import argparse
+import importlib
+import logging
+
+"""
+Commands of the pipeline
+validate: validates the templates (source/validation)
+permissionsets: creates, updates and deletes the permission sets (source/permissionsets)
+assignments: resolves the assignment templates into assignments.json (source/assignments)
+all: runs the three stages in order in one process, sharing the discovered state, the clients and the caches
+drift: compares the permission sets and assignments in AWS SSO with the repository without changing anything (read-only)
+
+Run it with 'python -m identitycenter <command>' from the source folder, or through the script of each stage
+"""
+
+# Stage modules of each command. They are only imported when the command runs, so e.g. 'validate'
+# never loads the organization and assignment modules
+COMMANDS = {
+    'validate': ['validation'],
+    'permissionsets': ['permissionsets'],
+    'assignments': ['assignments'],
+    'all': ['validation', 'permissionsets', 'assignments'],
+    'drift': ['drift']
+}
+
+log = logging.getLogger(__name__)
+
+# State discovered by one stage and reused by the next stages of the same run
+class PipelineState:
+    def __init__(self):
+        self.instanceDetails = None
+        # Name -> ARN of the permission sets managed by the pipeline, saved by the permissionsets stage
+        self.permissionSetArns = None
+
+    # IAM Identity Center instance (InstanceArn and IdentityStoreId), listed once per run
+    def instance(self):
+        if self.instanceDetails is None:
+            from identitycenter import clients
+            self.instanceDetails = clients.get_client('sso-admin').list_instances()['Instances'][0]
+        return self.instanceDetails
+
+# Same format as the pipeline scripts always used
+def configure_logging():
+    logging.basicConfig(format='%(asctime)s,%(msecs)03d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+        datefmt='%Y-%m-%d:%H:%M:%S',
+        level=logging.DEBUG)
+    logging.getLogger().setLevel(logging.INFO)
+
+# Arguments shared by all the stages: the template folders, --workers and the rate limit and metrics arguments.
+# Each stage module adds its own arguments with add_arguments(parser)
+def add_common_arguments(parser, throttling):
+    parser.add_argument('--ps-folder', action="store", dest='psFolder', default='../../templates/permissionsets/',
+        help='Folder of the permission set templates. Default: %(default)s')
+    parser.add_argument('--assignments-folder', action="store", dest='asFolder', default='../../templates/assignments/',
+        help='Folder of the assignment templates. Default: %(default)s')
+    parser.add_argument('--workers', action="store", dest='workers', type=int,
+        help='Number of parallel calls of each stage. Default: 1 for permissionsets (serial), 10 for the other stages')
+    parser.add_argument('--rate-limit', action="append", dest='rateLimits', metavar='SERVICE=CALLS_PER_SECOND',
+        help='Calls per second for a service, shared by all workers (e.g. organizations=5). It can be repeated. Defaults: '
+        + ', '.join(f'{service}={rate}' for service, rate in throttling.DEFAULT_RATES.items()))
+    parser.add_argument('--deadline', action="store", dest='deadline', type=int, default=throttling.DEFAULT_DEADLINE,
+        help='Seconds the run can take. After that, calls to AWS fail instead of waiting or retrying. 0 disables it. Default: %(default)s')
+    parser.add_argument('--metrics-file', action="store", dest='metricsFile',
+        help='Write the API call metrics (calls, retries, throttles and latency per operation) and the duration of each phase as JSON to this file at exit')
+    parser.add_argument('--metrics-emf', action="store_true", dest='metricsEmf',
+        help='Print the metrics in CloudWatch Embedded Metric Format (EMF) to stdout at exit')
+
+# Parses the command line and runs the stages of the command. The metrics, the rate limiter and the clients are set up once,
+# so in 'all' mode the stages share the connections, the rate of each service and the instance lookup.
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='identitycenter', description='AWS SSO Pipeline', add_help=False)
+    parser.add_argument('command', choices=COMMANDS)
+    command, remaining = parser.parse_known_args(argv)
+
+    from identitycenter import clients
+    from identitycenter import metrics
+    from identitycenter import throttling
+    stages = [importlib.import_module(f'identitycenter.{stage}') for stage in COMMANDS[command.command]]
+
+    commandParser = argparse.ArgumentParser(prog=f'identitycenter {command.command}', description='AWS SSO Pipeline: ' + command.command)
+    add_common_arguments(commandParser, throttling)
+    for eachStage in stages:
+        eachStage.add_arguments(commandParser)
+    args = commandParser.parse_args(remaining)
+
+    configure_logging()
+    metrics.enable(command.command, args.metricsFile, args.metricsEmf)
+    throttling.enable(args.rateLimits, args.deadline)
+    clients.configure(args.workers or max(eachStage.DEFAULT_WORKERS for eachStage in stages))
+
+    state = PipelineState()
+    for eachStage, stageName in zip(stages, COMMANDS[command.command]):
+        if len(stages) > 1:
+            metrics.set_stage(stageName)
+        # A stage that only wrote an artifact (a catalog or a plan) returns True and the next stages are not run
+        if eachStage.run(args, state):
+            break
+    metrics.set_stage(None)
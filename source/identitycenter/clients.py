@@ -0,0 +1,65 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Pipeline Client Factory
+## +-----------------------------------
+
+import threading
+
+import boto3
+from botocore.config import Config
+
+from identitycenter import throttling
+
+# Connections kept open per client. Raised to the number of workers by configure()
+DEFAULT_POOL_SIZE = 10
+
+poolSize = DEFAULT_POOL_SIZE
+cachedClients = {}
+lock = threading.Lock()
+
+# Sizes the connection pools for the number of worker threads of the script. Clients created before are discarded
+def configure(workers):
+    global poolSize
+    with lock:
+        size = max(DEFAULT_POOL_SIZE, workers + 2)
+        if size != poolSize:
+            poolSize = size
+            cachedClients.clear()
+
+# Returns the session the hooks of the scripts are registered on: the one given, or the boto3 default session
+# (created if needed), which get_client uses
+def get_session(session=None):
+    if session is None:
+        if boto3.DEFAULT_SESSION is None:
+            boto3.setup_default_session()
+        session = boto3.DEFAULT_SESSION
+    return session
+
+# Returns the client of the service, created once per run from the boto3 default session and shared by all threads.
+# Creating a client loads the service model and opens new connections, so the scripts never create them per call.
+# Connections are kept alive and the pool fits every worker, with the retry configuration of the rate limiter.
+def get_client(service):
+    with lock:
+        if service not in cachedClients:
+            config = throttling.RETRY_CONFIG.merge(Config(max_pool_connections=poolSize, tcp_keepalive=True))
+            cachedClients[service] = boto3.client(service, config=config)
+        return cachedClients[service]
+
+# Discards every client (e.g. after the default session changed)
+def reset():
+    with lock:
+        cachedClients.clear()
@@ -0,0 +1,86 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Permission Set Discovery
+## +-----------------------------------
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# Tag that identifies the permission sets managed by the pipeline
+PIPELINE_TAG = 'SSOPipeline'
+
+# Tag with the hash of the template last applied to the permission set (see permissionset_state.permission_set_hash)
+HASH_TAG = 'SSOPipelineHash'
+
+# Number of permission sets looked up in parallel
+DEFAULT_WORKERS = 10
+
+# Returns every permission set ARN in the instance, without duplicates and in the order returned by the API
+def list_permission_set_arns(client, instanceArn):
+    arns = []
+    seen = set()
+    paginator = client.get_paginator('list_permission_sets')
+    for page in paginator.paginate(InstanceArn=instanceArn):
+        for eachArn in page['PermissionSets']:
+            if eachArn not in seen:
+                seen.add(eachArn)
+                arns.append(eachArn)
+    return arns
+
+# Returns the tags of a permission set as a dictionary
+def list_permission_set_tags(client, instanceArn, permissionSetArn):
+    tags = {}
+    paginator = client.get_paginator('list_tags_for_resource')
+    for page in paginator.paginate(InstanceArn=instanceArn, ResourceArn=permissionSetArn):
+        for eachTag in page['Tags']:
+            tags[eachTag['Key']] = eachTag.get('Value', '')
+    return tags
+
+# Returns the description of a permission set if it has the pipeline tag, otherwise None
+def describe_managed_permission_set(client, instanceArn, permissionSetArn):
+    tags = list_permission_set_tags(client, instanceArn, permissionSetArn)
+    if PIPELINE_TAG not in tags:
+        return None
+
+    response = client.describe_permission_set(InstanceArn=instanceArn, PermissionSetArn=permissionSetArn)
+    return response['PermissionSet'], tags
+
+# This method will return all permission sets in AWS SSO with the tag 'SSOPipeline'. The tag and describe
+# lookups are issued in parallel, one task per permission set. The result is an index with three dictionaries
+# keyed by permission set name:
+#   Arns: permission set ARN
+#   Descriptions: the 'PermissionSet' returned by describe_permission_set (Description, SessionDuration, RelayState...)
+#   Tags: the tags of the permission set
+def get_managed_permission_sets(client, instanceArn, workers=DEFAULT_WORKERS):
+    permissionSetArns = list_permission_set_arns(client, instanceArn)
+    log.info(f"Looking up {len(permissionSetArns)} permission sets for the tag '{PIPELINE_TAG}'")
+
+    index = {'Arns': {}, 'Descriptions': {}, 'Tags': {}}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = executor.map(lambda eachArn: describe_managed_permission_set(client, instanceArn, eachArn), permissionSetArns)
+        for permissionSetArn, result in zip(permissionSetArns, results):
+            if result is None:
+                continue
+            description, tags = result
+            index['Arns'][description['Name']] = permissionSetArn
+            index['Descriptions'][description['Name']] = description
+            index['Tags'][description['Name']] = tags
+
+    log.info(f"{len(index['Arns'])} permission sets are managed by the pipeline")
+    return index
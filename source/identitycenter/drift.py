@@ -0,0 +1,184 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Drift Report
+## +-----------------------------------
+
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from identitycenter import account_assignments
+from identitycenter import assignment_records
+from identitycenter import assignments
+from identitycenter import clients
+from identitycenter import discovery
+from identitycenter import metrics
+from identitycenter import permissionset_plan
+from identitycenter import permissionset_state
+from identitycenter import readonly
+from identitycenter import templates
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 20
+
+# Version of the report file. It changes when fields are removed or change meaning
+REPORT_VERSION = 1
+
+# Arguments of the drift command
+def add_arguments(parser):
+    parser.add_argument('--mgmt_account', action="store", dest='mgmtAccount')
+    assignments.add_cache_arguments(parser)
+    parser.add_argument('--report-file', action="store", dest='reportFile', default='drift-report.json',
+        help='File where the drift report is written as JSON. Default: %(default)s')
+    parser.add_argument('--fail-on-drift', action="store_true", dest='failOnDrift',
+        help='Exit with an error when any drift is found')
+
+# Reads the content of every managed permission set in parallel. The descriptions of the discovery are reused. Returns name -> state
+def snapshot_permission_sets(permissionSetIndex):
+    with metrics.phase('snapshot-permission-sets'):
+        return permissionset_state.read_permission_set_states(clients.get_client('sso-admin'), ssoInstanceArn, permissionSetIndex['Arns'],
+            permissionSetIndex['Descriptions'], sorted(permissionSetIndex['Arns']), args.workers)
+
+# Lists the current account assignments of every managed permission set
+def list_current_assignments(permissionSetArns):
+    with metrics.phase('list-assignments'):
+        return account_assignments.list_current_assignments(clients.get_client('sso-admin'), ssoInstanceArn, permissionSetArns.values(), args.workers)
+
+# Resolves the assignment templates as the assignments stage does, and returns the keys of the resolved assignments and the
+# templates left out because their permission set is not in AWS SSO (already reported as missing permission sets)
+def resolve_desired_assignments(state, permissionSetArns):
+    assignments.initialize(args, state)
+    repositoryAssignments = assignments.load_assignments_from_file()
+    resolvable = [eachAssignment for eachAssignment in repositoryAssignments['Assignments'] if eachAssignment['PermissionSetName'] in permissionSetArns]
+    skipped = [{'SID': eachAssignment['SID'], 'PermissionSetName': eachAssignment['PermissionSetName']}
+        for eachAssignment in repositoryAssignments['Assignments'] if eachAssignment['PermissionSetName'] not in permissionSetArns]
+
+    principalIds = assignments.resolve_principal_ids({'Assignments': resolvable})
+    try:
+        with metrics.phase('resolve-assignments'):
+            desired = {assignment_records.record_key(eachRecord) for eachRecord in assignments.create_assignment_file(permissionSetArns, {'Assignments': resolvable}, principalIds)}
+    except assignments.AssignmentError as error:
+        log.error(str(error))
+        exit(1)
+    if assignments.persistentCache:
+        assignments.persistentCache.save()
+    return desired, skipped
+
+# Permission sets in the templates but not in AWS SSO, with a different content, and managed by the pipeline but not in the templates.
+# The differences are the ones the permission sets stage would apply (see permissionset_plan.build_plan)
+def permission_set_drift(permissionSetArns, currentStates, repositoryPermissionSets):
+    plan = permissionset_plan.build_plan(ssoInstanceArn, permissionSetArns, currentStates, repositoryPermissionSets)
+    for eachChange in plan['Changes']:
+        log.info('[DRIFT] ' + permissionset_plan.describe_change(eachChange))
+    return {
+        'Missing': [eachChange['Name'] for eachChange in plan['Changes'] if eachChange['Action'] == 'CREATE'],
+        'Changed': [{'Name': eachChange['Name'], 'Arn': eachChange['Arn'], 'Changes': eachChange['Changes']}
+            for eachChange in plan['Changes'] if eachChange['Action'] == 'UPDATE'],
+        'NotInRepository': [{'Name': eachChange['Name'], 'Arn': eachChange['Arn']} for eachChange in plan['Changes'] if eachChange['Action'] == 'DELETE']
+    }
+
+# Assignments resolved from the templates but not in AWS SSO, and in AWS SSO but not in the templates.
+# Assignments in the management account are not managed by the pipeline, so they are never reported
+def assignment_drift(currentAssignments, desiredAssignments, permissionSetArns):
+    names = {arn: name for name, arn in permissionSetArns.items()}
+    missing, unexpected = account_assignments.diff_assignments(currentAssignments, desiredAssignments, protectedAccounts={args.mgmtAccount})
+
+    def record(key):
+        return {'Target': key[0], 'PermissionSetName': names.get(key[1]), 'PermissionSetArn': key[1], 'PrincipalType': key[2], 'PrincipalId': key[3]}
+    return {'Missing': [record(eachKey) for eachKey in missing], 'Unexpected': [record(eachKey) for eachKey in unexpected]}
+
+def write_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+# Runs the drift command: the managed permission sets with their content and their account assignments are read in parallel
+# and compared with the templates and the resolved assignment templates. Only List, Describe and Get calls are made,
+# which is enforced by the read-only guard, so it can run at any time next to the pipeline.
+def run(arguments, state):
+    print("#################################")
+    print("# Starting AWS SSO Drift Report #")
+    print("#################################\n")
+
+    global args
+    global ssoInstanceArn
+    args = argparse.Namespace(**vars(arguments))
+    if args.workers is None:
+        args.workers = DEFAULT_WORKERS
+
+    readonly.enable()
+    try:
+        # The permission sets and the assignments are read at the same time, both with --workers calls
+        clients.configure(2 * args.workers)
+        ssoInstanceArn = state.instance()['InstanceArn']
+
+        with metrics.phase('discovery'):
+            permissionSetIndex = discovery.get_managed_permission_sets(clients.get_client('sso-admin'), ssoInstanceArn, args.workers)
+        permissionSetArns = permissionSetIndex['Arns']
+        with metrics.phase('load-templates'):
+            repositoryPermissionSets = templates.load_permission_sets_by_name(args.psFolder, max(args.workers, templates.DEFAULT_WORKERS))
+        if repositoryPermissionSets is None:
+            exit(1)
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            statesFuture = executor.submit(snapshot_permission_sets, permissionSetIndex)
+            currentFuture = executor.submit(list_current_assignments, permissionSetArns)
+            desiredFuture = executor.submit(resolve_desired_assignments, state, permissionSetArns)
+            try:
+                currentStates = statesFuture.result()
+                currentAssignments = currentFuture.result()
+            except Exception as error:
+                log.error("It was not possible to read the current permission sets and assignments. Reason: " + str(error))
+                exit(1)
+            desiredAssignments, skippedTemplates = desiredFuture.result()
+    finally:
+        readonly.disable()
+
+    permissionSets = permission_set_drift(permissionSetArns, currentStates, repositoryPermissionSets)
+    accountAssignments = assignment_drift(currentAssignments, desiredAssignments, permissionSetArns)
+    accountAssignments['SkippedTemplates'] = skippedTemplates
+
+    summary = {
+        'PermissionSetsMissing': len(permissionSets['Missing']),
+        'PermissionSetsChanged': len(permissionSets['Changed']),
+        'PermissionSetsNotInRepository': len(permissionSets['NotInRepository']),
+        'AssignmentsMissing': len(accountAssignments['Missing']),
+        'AssignmentsUnexpected': len(accountAssignments['Unexpected'])
+    }
+    summary['Drift'] = any(summary.values())
+    report = {
+        'Version': REPORT_VERSION,
+        'Generated': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'InstanceArn': ssoInstanceArn,
+        'Summary': summary,
+        'PermissionSets': permissionSets,
+        'Assignments': accountAssignments
+    }
+    write_report(report, args.reportFile)
+
+    log.info(f"{len(permissionSetArns)} managed permission sets and {len(currentAssignments)} account assignments compared with "
+        f"{len(repositoryPermissionSets)} permission set templates and {len(desiredAssignments)} resolved assignments")
+    log.info(f"Permission sets: {summary['PermissionSetsMissing']} missing, {summary['PermissionSetsChanged']} changed, "
+        f"{summary['PermissionSetsNotInRepository']} not in the repository. Assignments: {summary['AssignmentsMissing']} missing, "
+        f"{summary['AssignmentsUnexpected']} unexpected. Report written to {args.reportFile}")
+
+    if summary['Drift'] and args.failOnDrift:
+        log.error('Drift found between AWS SSO and the repository')
+        exit(1)
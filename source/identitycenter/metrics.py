@@ -0,0 +1,210 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Pipeline API Metrics
+## +-----------------------------------
+
+import atexit
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from identitycenter import clients
+
+log = logging.getLogger(__name__)
+
+EMF_NAMESPACE = 'SSOPipeline'
+
+# Upper bound (milliseconds) of each latency histogram bucket. The last bucket has no bound
+LATENCY_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+# Error codes that botocore treats as throttling
+THROTTLING_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException', 'TooManyRequestsException',
+    'ProvisionedThroughputExceededException', 'TransactionInProgressException', 'RequestLimitExceeded',
+    'BandwidthLimitExceeded', 'LimitExceededException', 'RequestThrottled', 'SlowDown', 'PriorRequestNotComplete',
+    'EC2ThrottledException'
+}
+
+# Metrics of the current run. The event handlers are registered once per session and always report to it
+collector = None
+
+# Stage of the pipeline that is running, when several stages run in one process. Its name prefixes the phases
+stage = None
+
+# Counts the calls, attempts, retries, throttles, errors and latency of each AWS operation, and times the phases of a script.
+# Operations are named <service>.<Operation> (e.g. organizations.ListAccountsForParent). It can be used from several threads.
+class MetricsCollector:
+    def __init__(self, script):
+        self.script = script
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.phases = {}
+
+    def operation(self, name):
+        if name not in self.operations:
+            self.operations[name] = {
+                'Calls': 0, 'Attempts': 0, 'Retries': 0, 'Throttles': 0, 'Errors': 0,
+                'LatencyTotal': 0.0, 'LatencyMax': 0.0, 'LatencyHistogram': [0] * (len(LATENCY_BUCKETS) + 1)
+            }
+        return self.operations[name]
+
+    def record_attempt(self, name, throttled):
+        with self.lock:
+            operation = self.operation(name)
+            operation['Attempts'] += 1
+            if throttled:
+                operation['Throttles'] += 1
+
+    def record_call(self, name, latency, failed):
+        milliseconds = latency * 1000
+        bucket = next((index for index, bound in enumerate(LATENCY_BUCKETS) if milliseconds <= bound), len(LATENCY_BUCKETS))
+        with self.lock:
+            operation = self.operation(name)
+            operation['Calls'] += 1
+            operation['Retries'] = operation['Attempts'] - operation['Calls']
+            operation['LatencyTotal'] += milliseconds
+            operation['LatencyMax'] = max(operation['LatencyMax'], milliseconds)
+            operation['LatencyHistogram'][bucket] += 1
+            if failed:
+                operation['Errors'] += 1
+
+    # Times a phase of the script. Phases with the same name are added up
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def summary(self):
+        with self.lock:
+            operations = {}
+            for name in sorted(self.operations):
+                operation = dict(self.operations[name])
+                operation['LatencyAverage'] = round(operation['LatencyTotal'] / operation['Calls'], 1) if operation['Calls'] else 0
+                operation['LatencyTotal'] = round(operation['LatencyTotal'], 1)
+                operation['LatencyMax'] = round(operation['LatencyMax'], 1)
+                operations[name] = operation
+            totals = {key: sum(operation[key] for operation in operations.values()) for key in ('Calls', 'Retries', 'Throttles', 'Errors')}
+            return {
+                'Script': self.script,
+                'Started': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started)),
+                'Duration': round(time.time() - self.started, 3),
+                'LatencyBuckets': LATENCY_BUCKETS,
+                'Totals': totals,
+                'Phases': {name: round(duration, 3) for name, duration in self.phases.items()},
+                'Operations': operations
+            }
+
+# CloudWatch Embedded Metric Format: one line per operation and one line per phase
+def emf_lines(summary):
+    timestamp = int(time.time() * 1000)
+    lines = []
+    for name, operation in summary['Operations'].items():
+        lines.append({
+            '_aws': {'Timestamp': timestamp, 'CloudWatchMetrics': [{
+                'Namespace': EMF_NAMESPACE,
+                'Dimensions': [['Script', 'Operation']],
+                'Metrics': [{'Name': 'Calls', 'Unit': 'Count'}, {'Name': 'Retries', 'Unit': 'Count'}, {'Name': 'Throttles', 'Unit': 'Count'},
+                    {'Name': 'Errors', 'Unit': 'Count'}, {'Name': 'LatencyAverage', 'Unit': 'Milliseconds'}, {'Name': 'LatencyMax', 'Unit': 'Milliseconds'}]
+            }]},
+            'Script': summary['Script'],
+            'Operation': name,
+            **{key: operation[key] for key in ('Calls', 'Retries', 'Throttles', 'Errors', 'LatencyAverage', 'LatencyMax')}
+        })
+    for name, duration in summary['Phases'].items():
+        lines.append({
+            '_aws': {'Timestamp': timestamp, 'CloudWatchMetrics': [{
+                'Namespace': EMF_NAMESPACE,
+                'Dimensions': [['Script', 'Phase']],
+                'Metrics': [{'Name': 'Duration', 'Unit': 'Seconds'}]
+            }]},
+            'Script': summary['Script'],
+            'Phase': name,
+            'Duration': duration
+        })
+    return [json.dumps(line, separators=(',', ':')) for line in lines]
+
+def operation_name(model):
+    return f'{model.service_model.service_name}.{model.name}'
+
+def on_before_call(model, context, **kwargs):
+    context['metricsStart'] = time.perf_counter()
+
+def on_needs_retry(operation, response=None, caught_exception=None, **kwargs):
+    if collector is None:
+        return None
+    code = response[1].get('Error', {}).get('Code') if response else None
+    collector.record_attempt(operation_name(operation), code in THROTTLING_CODES)
+    return None
+
+def on_after_call(model, context, parsed=None, **kwargs):
+    if collector is not None and 'metricsStart' in context:
+        collector.record_call(operation_name(model), time.perf_counter() - context['metricsStart'], 'Error' in (parsed or {}))
+
+def on_after_call_error(context, exception, **kwargs):
+    if collector is not None and 'metricsStart' in context and 'metricsOperation' in context:
+        collector.record_call(context['metricsOperation'], time.perf_counter() - context['metricsStart'], True)
+
+def on_before_parameter_build(model, context, **kwargs):
+    context['metricsOperation'] = operation_name(model)
+
+# Starts collecting the metrics of the script from the calls made with the session (by default the boto3 default session).
+# At exit, a summary is logged and, if requested, written as JSON to jsonPath and as CloudWatch EMF lines to stdout.
+def enable(script, jsonPath=None, emf=False, session=None):
+    global collector
+    collector = MetricsCollector(script)
+
+    session = clients.get_session(session)
+    for event, handler in (('before-parameter-build', on_before_parameter_build), ('before-call', on_before_call),
+            ('needs-retry', on_needs_retry), ('after-call', on_after_call), ('after-call-error', on_after_call_error)):
+        session.events.register(event, handler, unique_id=f'identitycenter-metrics-{event}')
+
+    atexit.register(write_summary, collector, jsonPath, emf)
+    return collector
+
+def write_summary(metrics, jsonPath=None, emf=False):
+    summary = metrics.summary()
+    totals = summary['Totals']
+    log.info(f"{totals['Calls']} API calls ({totals['Retries']} retries, {totals['Throttles']} throttled, {totals['Errors']} failed) in {summary['Duration']}s. "
+        + ', '.join(f"{name}: {duration}s" for name, duration in summary['Phases'].items()))
+    if jsonPath:
+        with open(jsonPath, 'w') as f:
+            json.dump(summary, f, indent=4)
+        log.info(f"Metrics written to {jsonPath}")
+    if emf:
+        for line in emf_lines(summary):
+            print(line)
+
+# Sets the stage of the pipeline that is running (None when the process runs a single stage)
+def set_stage(name):
+    global stage
+    stage = name
+
+# Times a phase of the current run (does nothing when the metrics are not enabled)
+@contextmanager
+def phase(name):
+    if collector is None:
+        yield
+        return
+    with collector.phase(f'{stage}.{name}' if stage else name):
+        yield
@@ -0,0 +1,83 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS Organizations Index
+## +-----------------------------------
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+log = logging.getLogger(__name__)
+
+# Number of organizational units listed in parallel
+DEFAULT_WORKERS = 10
+
+# In-memory view of the organization: the root, the organizational units under each parent and the ACTIVE accounts
+# directly under each parent. It is built once per run, so targets are resolved without calling AWS Organizations again.
+class OrganizationIndex:
+    def __init__(self, rootId, children, accounts):
+        self.rootId = rootId
+        self.children = children
+        self.accounts = accounts
+
+    # Plain dictionary used to store the index in the persistent cache
+    def to_dict(self):
+        return {'RootId': self.rootId, 'Children': self.children, 'Accounts': self.accounts}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['RootId'], data['Children'], data['Accounts'])
+
+def list_active_accounts_for_parent(client, parentId):
+    accounts = []
+    paginator = client.get_paginator('list_accounts_for_parent')
+    for page in paginator.paginate(ParentId=parentId):
+        for eachAccount in page['Accounts']:
+            if eachAccount['Status'] == 'ACTIVE':
+                accounts.append(eachAccount['Id'])
+    return accounts
+
+def list_ous_for_parent(client, parentId):
+    ous = []
+    paginator = client.get_paginator('list_organizational_units_for_parent')
+    for page in paginator.paginate(ParentId=parentId):
+        for eachOu in page['OrganizationalUnits']:
+            ous.append(eachOu['Id'])
+    return ous
+
+def crawl_parent(client, parentId):
+    return parentId, list_ous_for_parent(client, parentId), list_active_accounts_for_parent(client, parentId)
+
+# Crawls the whole organization starting from the root. Each parent is listed as soon as it is discovered,
+# so sibling OUs at every level are listed in parallel.
+def build_organization_index(client, workers=DEFAULT_WORKERS):
+    rootId = client.list_roots()['Roots'][0]['Id']
+    children = {}
+    accounts = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = {executor.submit(crawl_parent, client, rootId)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                parentId, ous, accountList = future.result()
+                children[parentId] = ous
+                accounts[parentId] = accountList
+                for eachOu in ous:
+                    pending.add(executor.submit(crawl_parent, client, eachOu))
+
+    log.info(f"Organization loaded: {len(children) - 1} organizational units and {sum(len(eachList) for eachList in accounts.values())} active accounts")
+    return OrganizationIndex(rootId, children, accounts)
@@ -0,0 +1,111 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Permission Set Change Plan
+## +-----------------------------------
+
+import json
+
+from identitycenter import permissionset_state
+
+# Version of the plan file. Plans of another version are rejected by load_plan
+PLAN_VERSION = 1
+
+# Order in which the changes are listed in the plan
+ACTION_ORDER = ['CREATE', 'UPDATE', 'DELETE']
+
+# State of a permission set right after create_permission_set, which only sets the name, description and session duration
+def created_state(desiredState):
+    return {
+        'Description': desiredState['Description'],
+        'SessionDuration': desiredState['SessionDuration'],
+        'RelayState': '',
+        'InlinePolicy': None,
+        'ManagedPolicies': [],
+        'CustomerManagedPolicies': [],
+        'PermissionBoundary': None
+    }
+
+# Converts a state (see permissionset_state.desired_permission_set_state) back to the template format used by the update helpers
+def template_from_state(name, state):
+    return {
+        'Name': name,
+        'Description': state['Description'],
+        'SessionDuration': state['SessionDuration'],
+        'RelayState': state['RelayState'],
+        'CustomPolicy': json.loads(state['InlinePolicy']) if state['InlinePolicy'] else None,
+        'ManagedPolicies': state['ManagedPolicies'],
+        'CustomerManagedPolicies': state['CustomerManagedPolicies'],
+        'PermissionBoundary': state['PermissionBoundary']
+    }
+
+# Builds the change plan from one snapshot of the permission sets managed by the pipeline:
+#   currentArns: name -> ARN of the managed permission sets
+#   currentStates: name -> state read with permissionset_state.read_permission_set_state (only the permission sets that were compared)
+#   repositoryPermissionSets: name -> template
+# Permission sets in both but not in currentStates (e.g. skipped by --incremental) are left out of the plan.
+# The plan has no timestamps and everything is sorted, so the same snapshot and templates always give the same file.
+def build_plan(instanceArn, currentArns, currentStates, repositoryPermissionSets):
+    changes = []
+    for name in sorted(repositoryPermissionSets):
+        desiredState = permissionset_state.desired_permission_set_state(repositoryPermissionSets[name])
+        contentHash = permissionset_state.permission_set_hash(repositoryPermissionSets[name])
+        if name not in currentArns:
+            changes.append({'Action': 'CREATE', 'Name': name, 'Desired': desiredState, 'Hash': contentHash,
+                'Changes': permissionset_state.diff_permission_set_state(created_state(desiredState), desiredState), 'Reprovision': False})
+        elif name in currentStates:
+            differences = permissionset_state.diff_permission_set_state(currentStates[name], desiredState)
+            if differences:
+                changes.append({'Action': 'UPDATE', 'Name': name, 'Arn': currentArns[name], 'Desired': desiredState, 'Hash': contentHash,
+                    'Changes': differences, 'Reprovision': True})
+
+    for name in sorted(currentArns):
+        if name not in repositoryPermissionSets:
+            changes.append({'Action': 'DELETE', 'Name': name, 'Arn': currentArns[name]})
+
+    changes.sort(key=lambda change: (ACTION_ORDER.index(change['Action']), change['Name']))
+    return {
+        'Version': PLAN_VERSION,
+        'InstanceArn': instanceArn,
+        'Current': dict(sorted(currentArns.items())),
+        'Changes': changes
+    }
+
+def write_plan(plan, path):
+    with open(path, 'w') as f:
+        json.dump(plan, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+def load_plan(path):
+    with open(path) as f:
+        plan = json.load(f)
+    if plan.get('Version') != PLAN_VERSION:
+        raise ValueError(f"Plan {path} has version {plan.get('Version')}, but version {PLAN_VERSION} is expected. Create the plan again")
+    return plan
+
+# One line per change, e.g. "UPDATE ReadOnly: ManagedPolicies (+1 -0), RelayState"
+def describe_change(change):
+    if change['Action'] == 'DELETE':
+        return f"DELETE {change['Name']}"
+    fields = []
+    for field, difference in change['Changes'].items():
+        if isinstance(difference['Desired'], list) or isinstance(difference['Current'], list):
+            added = len(set(difference['Desired'] or []) - set(difference['Current'] or []))
+            removed = len(set(difference['Current'] or []) - set(difference['Desired'] or []))
+            fields.append(f"{field} (+{added} -{removed})")
+        else:
+            fields.append(field)
+    return f"{change['Action']} {change['Name']}: " + (', '.join(fields) if fields else 'no other fields')
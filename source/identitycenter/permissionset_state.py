@@ -0,0 +1,129 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Permission Set State
+## +-----------------------------------
+
+import hashlib
+import json
+import botocore
+from concurrent.futures import ThreadPoolExecutor
+
+# Relay state used when the template doesn't have the field RelayState
+DEFAULT_RELAY_STATE = "https://console.aws.amazon.com/"
+
+# Fields compared between the permission set in AWS SSO and the template, in the order they are applied
+STATE_FIELDS = ['Description', 'SessionDuration', 'RelayState', 'InlinePolicy', 'ManagedPolicies', 'CustomerManagedPolicies', 'PermissionBoundary']
+
+# Fields changed by the update_permission_set API
+GENERAL_INFORMATION_FIELDS = ['Description', 'SessionDuration', 'RelayState']
+
+# Serializes a policy document with sorted keys and no whitespace, so two documents with the same content are equal strings
+def canonical_json(document):
+    return json.dumps(document, sort_keys=True, separators=(',', ':'))
+
+# Customer managed policies are referenced in templates by name with the path '/'
+def customer_managed_policy_key(reference):
+    path = reference.get('Path', '/')
+    return reference['Name'] if path == '/' else path + reference['Name']
+
+# Inverse of customer_managed_policy_key
+def customer_managed_policy_reference(key):
+    path, _, name = key.rpartition('/')
+    return {'Name': name, 'Path': path + '/' if path else '/'}
+
+# Converts the response of get_permissions_boundary_for_permission_set to the template format
+def boundary_from_response(boundary):
+    if 'ManagedPolicyArn' in boundary:
+        return {'PolicyType': 'AWS', 'Policy': boundary['ManagedPolicyArn']}
+    return {'PolicyType': 'CUSTOMER', 'Policy': customer_managed_policy_key(boundary['CustomerManagedPolicyReference'])}
+
+# Reads the current content of a permission set. If the describe_permission_set payload is already known
+# (e.g. from discovery.get_managed_permission_sets) it is reused instead of being requested again.
+def read_permission_set_state(client, instanceArn, permissionSetArn, description=None):
+    if description is None:
+        description = client.describe_permission_set(InstanceArn=instanceArn, PermissionSetArn=permissionSetArn)['PermissionSet']
+
+    inlinePolicy = client.get_inline_policy_for_permission_set(InstanceArn=instanceArn, PermissionSetArn=permissionSetArn)['InlinePolicy']
+
+    managedPolicies = []
+    paginator = client.get_paginator('list_managed_policies_in_permission_set')
+    for page in paginator.paginate(InstanceArn=instanceArn, PermissionSetArn=permissionSetArn):
+        managedPolicies.extend(eachPolicy['Arn'] for eachPolicy in page['AttachedManagedPolicies'])
+
+    customerManagedPolicies = []
+    paginator = client.get_paginator('list_customer_managed_policy_references_in_permission_set')
+    for page in paginator.paginate(InstanceArn=instanceArn, PermissionSetArn=permissionSetArn):
+        customerManagedPolicies.extend(customer_managed_policy_key(eachPolicy) for eachPolicy in page['CustomerManagedPolicyReferences'])
+
+    try:
+        response = client.get_permissions_boundary_for_permission_set(InstanceArn=instanceArn, PermissionSetArn=permissionSetArn)
+        permissionBoundary = boundary_from_response(response['PermissionsBoundary'])
+    except botocore.exceptions.ClientError as error:
+        if error.response['Error']['Code'] != 'ResourceNotFoundException':
+            raise
+        permissionBoundary = None
+
+    return {
+        'Description': description.get('Description', ''),
+        'SessionDuration': description.get('SessionDuration'),
+        'RelayState': description.get('RelayState', ''),
+        'InlinePolicy': canonical_json(json.loads(inlinePolicy)) if inlinePolicy else None,
+        'ManagedPolicies': sorted(set(managedPolicies)),
+        'CustomerManagedPolicies': sorted(set(customerManagedPolicies)),
+        'PermissionBoundary': permissionBoundary
+    }
+
+# Reads the current content of the permission sets (names, from permissionSetArns: name -> ARN) in parallel, as one snapshot.
+# The describe payloads of the discovery (descriptions: name -> payload) are reused. Returns name -> state
+def read_permission_set_states(client, instanceArn, permissionSetArns, descriptions, names, workers):
+    def read(name):
+        return read_permission_set_state(client, instanceArn, permissionSetArns[name], descriptions.get(name))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return dict(zip(names, executor.map(read, names)))
+
+# Returns the state a permission set must have according to its template, in the same format as read_permission_set_state
+def desired_permission_set_state(permissionSet):
+    permissionBoundary = None
+    if permissionSet.get('PermissionBoundary'):
+        permissionBoundary = {
+            'PolicyType': 'AWS' if permissionSet['PermissionBoundary']['PolicyType'] == 'AWS' else 'CUSTOMER',
+            'Policy': permissionSet['PermissionBoundary']['Policy']
+        }
+
+    return {
+        'Description': permissionSet['Description'],
+        'SessionDuration': permissionSet['SessionDuration'],
+        'RelayState': permissionSet.get('RelayState', DEFAULT_RELAY_STATE),
+        'InlinePolicy': canonical_json(permissionSet['CustomPolicy']) if permissionSet.get('CustomPolicy') else None,
+        'ManagedPolicies': sorted(set(permissionSet.get('ManagedPolicies') or [])),
+        'CustomerManagedPolicies': sorted(set(permissionSet.get('CustomerManagedPolicies') or [])),
+        'PermissionBoundary': permissionBoundary
+    }
+
+# Hash of the template content. It is computed from the desired state, so formatting, key order and default values
+# in the template file don't change it.
+def permission_set_hash(permissionSet):
+    return hashlib.sha256(canonical_json(desired_permission_set_state(permissionSet)).encode('utf-8')).hexdigest()
+
+# Returns only the fields that are different, as {field: {'Current': ..., 'Desired': ...}}. An empty dictionary means no changes.
+def diff_permission_set_state(currentState, desiredState):
+    differences = {}
+    for eachField in STATE_FIELDS:
+        if currentState.get(eachField) != desiredState.get(eachField):
+            differences[eachField] = {'Current': currentState.get(eachField), 'Desired': desiredState.get(eachField)}
+    return differences
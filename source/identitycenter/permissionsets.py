@@ -0,0 +1,745 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Permission Set Management
+## +-----------------------------------
+
+import botocore
+import argparse
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from identitycenter import clients
+from identitycenter import discovery
+from identitycenter import metrics
+from identitycenter import permissionset_plan
+from identitycenter import permissionset_state
+from identitycenter import provisioning
+from identitycenter import templates
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 1
+
+# Permission sets read in parallel for the snapshot of --plan, even when the changes are applied serially
+SNAPSHOT_WORKERS = 10
+
+# Arguments of the permission sets stage
+def add_arguments(parser):
+    parser.add_argument('--diff', action="store_true", dest='diff',
+        help='Read the current permission set content and only apply what is different from the template')
+    parser.add_argument('--incremental', action="store_true", dest='incremental',
+        help='Only update permission sets whose template changed since the last run (compared with the SSOPipelineHash tag). Creations and deletions are always applied')
+    parser.add_argument('--provisioning-timeout', action="store", dest='provisioningTimeout', type=int, default=900,
+        help='Seconds to wait for all permission set provisioning requests to finish. Use 0 to not wait. Default: 900')
+    parser.add_argument('--plan', action="store", dest='planFile',
+        help='Read the managed permission sets once, write the changes needed (creates, updates with the fields that change, deletes and re-provisions) to this file and exit without changing anything')
+    parser.add_argument('--apply-plan', action="store", dest='applyPlanFile',
+        help='Apply the changes of a plan written by --plan, without reading the permission sets or the templates again')
+
+# Raised by the update/create/delete helpers so the caller decides whether to stop the run or collect the error
+class PermissionSetError(Exception):
+    pass
+
+# This method will return all permission sets in AWS SSO with the tag 'SSOPipeline'
+def get_current_permissionset_list():
+    # Descriptions are kept so the --diff mode doesn't need to describe each permission set again,
+    # and tags so the --incremental mode can compare the template hashes
+    global currentPermissionSetDescriptions
+    global currentPermissionSetTags
+
+    client = clients.get_client('sso-admin')
+    permissionSetIndex = discovery.get_managed_permission_sets(client, ssoInstanceArn)
+    currentPermissionSetDescriptions = permissionSetIndex['Descriptions']
+    currentPermissionSetTags = permissionSetIndex['Tags']
+    return permissionSetIndex['Arns']
+
+# This method will return all permission sets in the folder specified in the script argument (--ps-folder) in a single dictionary
+def get_repository_permissionset_list():
+    perm_set_dict = templates.load_permission_sets_by_name(args.psFolder, max(args.workers, templates.DEFAULT_WORKERS))
+    if perm_set_dict is None:
+        exit(1)
+    return perm_set_dict
+
+
+#########################
+## GENERAL INFORMATION ##
+#########################
+# This will update general information of permission set, like description and session duration
+def update_general_information(permissionSet, permissionSetArn, client):
+    log.info(f"[PS: {permissionSet['Name']}] " + "Updating General Information...")
+
+    relay_state = permissionSet.get('RelayState', "https://console.aws.amazon.com/")
+    
+    try:
+        response = client.update_permission_set(
+            InstanceArn=ssoInstanceArn,
+            PermissionSetArn=permissionSetArn,
+            Description=permissionSet['Description'],
+            SessionDuration=permissionSet['SessionDuration'],
+            RelayState=relay_state
+        )
+        log.info(f"[PS: {permissionSet['Name']}] " + "Successfully updated general information")
+    except Exception as e:
+        log.error('It was not possible to update Permission Set general information. Reason: ' + str(e))
+        raise PermissionSetError(str(e))
+
+###################
+## INLINE POLICY ##
+###################
+# Updates inline policy or delete it
+def update_inline_policy(permissionSet, permissionSetArn, client):
+    log.info(f"[PS: {permissionSet['Name']}] " + "Updating Inline Policy...")
+    
+    # Update inline policy
+    if ('CustomPolicy' in permissionSet) and (permissionSet['CustomPolicy']):
+        try:
+            response = client.put_inline_policy_to_permission_set(
+                InstanceArn=ssoInstanceArn,
+                PermissionSetArn=permissionSetArn,
+                InlinePolicy=json.dumps(permissionSet['CustomPolicy'])
+            )
+            log.info(f"[PS: {permissionSet['Name']}] " + "Successfully updated inline permissions")
+        except Exception as e:
+            log.error('It was not possible to update inline permission. Reason: ' + str(e))
+            raise PermissionSetError(str(e))
+    
+    # Delete inline policy
+    else:
+        try:
+            response = client.delete_inline_policy_from_permission_set(
+                InstanceArn=ssoInstanceArn,
+                PermissionSetArn=permissionSetArn
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] == 'ResourceNotFoundException':
+                log.info(f"[PS: {permissionSet['Name']}] " + "Not Inline policy found")   
+            else:
+                log.error(f"[PS: {permissionSet['Name']}] " + "It was not possible deleting Inline Policy. Reason: " + str(error))   
+                raise PermissionSetError(str(error))
+
+##########################
+## AWS MANAGED POLICIES ##
+##########################
+def update_aws_managed_policies(permissionSet, permissionSetArn, client):
+    log.info(f"[PS: {permissionSet['Name']}] " + "Updating on AWS Managed Policies...")
+    
+    # List AWS Managed Policies
+    response = client.list_managed_policies_in_permission_set(
+        InstanceArn=ssoInstanceArn,
+        PermissionSetArn=permissionSetArn,
+    )
+    currentManagedPolicies = response['AttachedManagedPolicies']
+
+    if ('ManagedPolicies' in permissionSet) and (permissionSet['ManagedPolicies']):
+        # Add new AWS managed policies
+        for eachManagedPolicy in permissionSet['ManagedPolicies']:
+            try:        
+                response = client.attach_managed_policy_to_permission_set(
+                    InstanceArn=ssoInstanceArn,
+                    PermissionSetArn=permissionSetArn,
+                    ManagedPolicyArn=eachManagedPolicy
+                )
+                log.info(f"[PS: {permissionSet['Name']}] " + "Successfully added managed policy: " + str(eachManagedPolicy))
+            except botocore.exceptions.ClientError as error:
+                if error.response['Error']['Code'] == 'ConflictException':
+                    log.info(f"[PS: {permissionSet['Name']}] " + "Managed policy was already attached: " + str(eachManagedPolicy))
+                else:
+                    log.error('It was not possible to add managed policies. Reason: ' + str(error))
+                    raise PermissionSetError(str(error))
+
+        # Remove AWS managed policies that were removed from repository
+        for eachManagedPolicy in currentManagedPolicies:
+            try:
+                if eachManagedPolicy['Arn'] not in permissionSet['ManagedPolicies']:
+                    log.info(f"[PS: {permissionSet['Name']}] " + "Managed policy needs to be removed from Permission Set: " + str(eachManagedPolicy['Arn']))
+                    response = client.detach_managed_policy_from_permission_set(
+                        InstanceArn=ssoInstanceArn,
+                        PermissionSetArn=permissionSetArn,
+                        ManagedPolicyArn=eachManagedPolicy['Arn']
+                    )                
+            except Exception as error:
+                log.error(f"[PS: {permissionSet['Name']}] " + 'It was not possible remove managed policies. Reason: ' + str(error))
+                raise PermissionSetError(str(error))
+    
+    else:
+        # Remove AWS managed policies that were removed from repository
+        for eachManagedPolicy in currentManagedPolicies:
+            try:
+                log.info(f"[PS: {permissionSet['Name']}] " + "Managed policy needs to be removed from Permission Set: " + str(eachManagedPolicy['Arn']))
+                response = client.detach_managed_policy_from_permission_set(
+                    InstanceArn=ssoInstanceArn,
+                    PermissionSetArn=permissionSetArn,
+                    ManagedPolicyArn=eachManagedPolicy['Arn']
+                )                
+            except Exception as error:
+                log.error(f"[PS: {permissionSet['Name']}] " + 'It was not possible remove managed policies. Reason: ' + str(error))
+                raise PermissionSetError(str(error))
+
+
+###############################
+## CUSTOMER MANAGED POLICIES ##
+###############################
+def update_customer_managed_policies(permissionSet, permissionSetArn, client):
+    log.info(f"[PS: {permissionSet['Name']}] " + "Updating Customer Managed Policies...")
+    
+    # List Customer Managed Policies
+    response = client.list_customer_managed_policy_references_in_permission_set(
+        InstanceArn=ssoInstanceArn,
+        PermissionSetArn=permissionSetArn,
+    )
+        
+    currentCustomerManagedPolicies = response['CustomerManagedPolicyReferences']
+
+    # This part will check if the field CustomerManagedPolicies exist in templates. Otherwise, will ignore this feature.
+    if ('CustomerManagedPolicies' in permissionSet) and (permissionSet['CustomerManagedPolicies']):
+
+
+        # Add customer managed policies
+        for eachManagedPolicy in permissionSet['CustomerManagedPolicies']:
+            try:
+                customerManagedPolicy = {'Name': 'customerManagedPolicy', 'Path': '/'}
+                customerManagedPolicy['Name'] = eachManagedPolicy
+                response = client.attach_customer_managed_policy_reference_to_permission_set(
+                    InstanceArn=ssoInstanceArn,
+                    PermissionSetArn=permissionSetArn,
+                    CustomerManagedPolicyReference=customerManagedPolicy
+                )
+                log.info(f"[PS: {permissionSet['Name']}] " + "Successfully added Customer Managed Policy: " + str(eachManagedPolicy))
+            except botocore.exceptions.ClientError as error:
+                if error.response['Error']['Code'] == 'ConflictException':
+                    log.info(f"[PS: {permissionSet['Name']}] " + "Customer Managed Policy was already attached: " + str(eachManagedPolicy))
+                else:
+                    log.error('It was not possible to add Customer Managed Policy. Reason: ' + str(error))
+                    raise PermissionSetError(str(error))
+
+        # Remove customer managed policies
+        for eachManagedPolicy in currentCustomerManagedPolicies:
+            try:
+                if eachManagedPolicy['Name'] not in permissionSet['CustomerManagedPolicies']:
+                    customerManagedPolicy = {'Name': 'customerManagedPolicy', 'Path': '/'}
+                    customerManagedPolicy['Name'] = eachManagedPolicy['Name']
+                    log.info(f"[PS: {permissionSet['Name']}] " + "Customer Managed Policy needs to be removed from Permission Set: " + str(eachManagedPolicy['Name']))
+                    response = client.detach_customer_managed_policy_reference_from_permission_set(
+                        InstanceArn=ssoInstanceArn,
+                        PermissionSetArn=permissionSetArn,
+                        CustomerManagedPolicyReference=customerManagedPolicy
+                    )                
+            except Exception as error:
+                log.error(f"[PS: {permissionSet['Name']}] " + 'It was not possible remove managed policies. Reason: ' + str(error))
+                raise PermissionSetError(str(error))
+
+    else:
+        for eachManagedPolicy in currentCustomerManagedPolicies:
+            try:                
+                customerManagedPolicy = {'Name': 'customerManagedPolicy', 'Path': '/'}
+                customerManagedPolicy['Name'] = eachManagedPolicy['Name']
+                log.info(f"[PS: {permissionSet['Name']}] " + "Customer Managed Policy needs to be removed from Permission Set: " + str(eachManagedPolicy['Name']))
+                response = client.detach_customer_managed_policy_reference_from_permission_set(
+                    InstanceArn=ssoInstanceArn,
+                    PermissionSetArn=permissionSetArn,
+                    CustomerManagedPolicyReference=customerManagedPolicy
+                )                
+            except Exception as error:
+                log.error(f"[PS: {permissionSet['Name']}] " + 'It was not possible remove managed policies. Reason: ' + str(error))
+                raise PermissionSetError(str(error))
+    
+#########################
+## PERMISSION BOUNDARY ##
+#########################
+def update_permission_boundary(permissionSet, permissionSetArn, client):
+    log.info(f"[PS: {permissionSet['Name']}] " + "Updating Permission Boundary...")
+    if ('PermissionBoundary' in permissionSet) and (permissionSet['PermissionBoundary']):
+        # Update Permission Boundary
+        try:
+            if permissionSet['PermissionBoundary']['PolicyType'] == 'AWS':
+                boundary = {'ManagedPolicyArn': 'managedpolicy'}
+                boundary['ManagedPolicyArn'] = permissionSet['PermissionBoundary']['Policy']
+            else:
+                boundary = {'CustomerManagedPolicyReference': {'Name': 'policy', 'Path': '/'}}
+                boundary['CustomerManagedPolicyReference']['Name'] = permissionSet['PermissionBoundary']['Policy']
+            
+            response = client.put_permissions_boundary_to_permission_set(
+                InstanceArn=ssoInstanceArn,
+                PermissionSetArn=permissionSetArn,
+                PermissionsBoundary=boundary
+            )
+            log.info(f"[PS: {permissionSet['Name']}] " + "Successfully attached Permission Boundary")
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] == 'ConflictException':
+                log.info(f"[PS: {permissionSet['Name']}] " + "Permission Boundary was already attached.")
+            else:
+                log.error('It was not possible to attach Permission Boundary. Reason: ' + str(error))
+                raise PermissionSetError(str(error))
+    else:
+        # Try to delete boundary
+        log.info(f"[PS: {permissionSet['Name']}] " + "No Permission Boundary found in code, thus it will be delete from permission set")
+        try:
+            response = client.delete_permissions_boundary_from_permission_set(
+                InstanceArn=ssoInstanceArn,
+                PermissionSetArn=permissionSetArn,
+            )
+            log.info(f"[PS: {permissionSet['Name']}] " + "Permission Boundary deleted")
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] == 'ResourceNotFoundException':
+                log.info(f"[PS: {permissionSet['Name']}] " + "No Permission Boundary found, nothing to delete.")
+            else:
+                log.error('It was not possible to delete Permission Boundary. Reason: ' + str(error))
+                raise PermissionSetError(str(error))
+
+##############################
+## PROVISION PERMISSION SETS ##
+##############################
+def provision_permission_set(permissionSet, permissionSetArn, client):
+    try:
+        response = client.provision_permission_set(
+            InstanceArn=ssoInstanceArn,
+            PermissionSetArn=permissionSetArn,
+            TargetType='ALL_PROVISIONED_ACCOUNTS'
+        )
+        provisioningTracker.add(permissionSet['Name'], response['PermissionSetProvisioningStatus'])
+        log.info(f"[PS: {permissionSet['Name']}] " + "Re-provisioning permission set in all accounts. It might take a while and will happen in parallel.")
+    except Exception as error:
+        log.error('It was not possible to provision the permission set in all accounts. Reason: ' + str(error))
+        raise PermissionSetError(str(error))
+
+############################
+## UPDATE PERMISSION SETS ##
+############################
+def update_permission_set(permissionSet, permissionSetArn):
+    client = clients.get_client('sso-admin')
+
+    if args.diff:
+        return update_permission_set_changes(permissionSet, permissionSetArn, client)
+    
+    # GENERAL INFORMATION
+    update_general_information(permissionSet, permissionSetArn, client)
+
+    # INLINE POLICY
+    update_inline_policy(permissionSet, permissionSetArn, client)
+
+    # AWS MANAGED POLICIES
+    update_aws_managed_policies(permissionSet, permissionSetArn, client)
+    
+    # CUSTOMER MANAGED POLICIES
+    update_customer_managed_policies(permissionSet, permissionSetArn, client)
+         
+    # PERMISSION BOUNDARY
+    update_permission_boundary(permissionSet, permissionSetArn, client)            
+
+    # PROVISION IN ALL ACCOUNTS
+    provision_permission_set(permissionSet, permissionSetArn, client)
+
+    return True
+
+#####################################
+## UPDATE PERMISSION SETS (--diff) ##
+#####################################
+# Attaches and detaches only the AWS managed policies that are different from the template
+def apply_managed_policy_changes(permissionSet, permissionSetArn, client, difference):
+    for eachManagedPolicy in sorted(set(difference['Desired']) - set(difference['Current'])):
+        try:
+            client.attach_managed_policy_to_permission_set(
+                InstanceArn=ssoInstanceArn,
+                PermissionSetArn=permissionSetArn,
+                ManagedPolicyArn=eachManagedPolicy
+            )
+            log.info(f"[PS: {permissionSet['Name']}] " + "Successfully added managed policy: " + str(eachManagedPolicy))
+        except Exception as error:
+            log.error('It was not possible to add managed policies. Reason: ' + str(error))
+            raise PermissionSetError(str(error))
+
+    for eachManagedPolicy in sorted(set(difference['Current']) - set(difference['Desired'])):
+        try:
+            log.info(f"[PS: {permissionSet['Name']}] " + "Managed policy needs to be removed from Permission Set: " + str(eachManagedPolicy))
+            client.detach_managed_policy_from_permission_set(
+                InstanceArn=ssoInstanceArn,
+                PermissionSetArn=permissionSetArn,
+                ManagedPolicyArn=eachManagedPolicy
+            )
+        except Exception as error:
+            log.error(f"[PS: {permissionSet['Name']}] " + 'It was not possible remove managed policies. Reason: ' + str(error))
+            raise PermissionSetError(str(error))
+
+# Attaches and detaches only the customer managed policies that are different from the template
+def apply_customer_managed_policy_changes(permissionSet, permissionSetArn, client, difference):
+    for eachManagedPolicy in sorted(set(difference['Desired']) - set(difference['Current'])):
+        try:
+            client.attach_customer_managed_policy_reference_to_permission_set(
+                InstanceArn=ssoInstanceArn,
+                PermissionSetArn=permissionSetArn,
+                CustomerManagedPolicyReference=permissionset_state.customer_managed_policy_reference(eachManagedPolicy)
+            )
+            log.info(f"[PS: {permissionSet['Name']}] " + "Successfully added Customer Managed Policy: " + str(eachManagedPolicy))
+        except Exception as error:
+            log.error('It was not possible to add Customer Managed Policy. Reason: ' + str(error))
+            raise PermissionSetError(str(error))
+
+    for eachManagedPolicy in sorted(set(difference['Current']) - set(difference['Desired'])):
+        try:
+            log.info(f"[PS: {permissionSet['Name']}] " + "Customer Managed Policy needs to be removed from Permission Set: " + str(eachManagedPolicy))
+            client.detach_customer_managed_policy_reference_from_permission_set(
+                InstanceArn=ssoInstanceArn,
+                PermissionSetArn=permissionSetArn,
+                CustomerManagedPolicyReference=permissionset_state.customer_managed_policy_reference(eachManagedPolicy)
+            )
+        except Exception as error:
+            log.error(f"[PS: {permissionSet['Name']}] " + 'It was not possible remove managed policies. Reason: ' + str(error))
+            raise PermissionSetError(str(error))
+
+# Reads the current permission set content, compares it with the template and only calls the APIs for the fields that changed.
+# The permission set is only re-provisioned when something changed.
+def update_permission_set_changes(permissionSet, permissionSetArn, client):
+    try:
+        currentState = permissionset_state.read_permission_set_state(client, ssoInstanceArn, permissionSetArn, currentPermissionSetDescriptions.get(permissionSet['Name']))
+    except Exception as error:
+        log.error(f"[PS: {permissionSet['Name']}] " + 'It was not possible to read the current Permission Set. Reason: ' + str(error))
+        raise PermissionSetError(str(error))
+
+    differences = permissionset_state.diff_permission_set_state(currentState, permissionset_state.desired_permission_set_state(permissionSet))
+    if not differences:
+        log.info(f"[PS: {permissionSet['Name']}] " + "Permission Set is up to date. Nothing to change.")
+        return False
+
+    return apply_permission_set_differences(permissionSet, permissionSetArn, client, differences)
+
+# Calls the APIs for the fields that are different (see permissionset_state.diff_permission_set_state) and re-provisions the permission set
+def apply_permission_set_differences(permissionSet, permissionSetArn, client, differences, reprovision=True):
+    log.info(f"[PS: {permissionSet['Name']}] " + "Fields to update: " + ", ".join(differences))
+
+    # GENERAL INFORMATION
+    if any(eachField in differences for eachField in permissionset_state.GENERAL_INFORMATION_FIELDS):
+        update_general_information(permissionSet, permissionSetArn, client)
+
+    # INLINE POLICY
+    if 'InlinePolicy' in differences:
+        update_inline_policy(permissionSet, permissionSetArn, client)
+
+    # AWS MANAGED POLICIES
+    if 'ManagedPolicies' in differences:
+        apply_managed_policy_changes(permissionSet, permissionSetArn, client, differences['ManagedPolicies'])
+
+    # CUSTOMER MANAGED POLICIES
+    if 'CustomerManagedPolicies' in differences:
+        apply_customer_managed_policy_changes(permissionSet, permissionSetArn, client, differences['CustomerManagedPolicies'])
+
+    # PERMISSION BOUNDARY
+    if 'PermissionBoundary' in differences:
+        update_permission_boundary(permissionSet, permissionSetArn, client)
+
+    # PROVISION IN ALL ACCOUNTS
+    if reprovision:
+        provision_permission_set(permissionSet, permissionSetArn, client)
+
+    return True
+
+###########################
+## CREATE PERMISSION SET ## 
+###########################
+# This method will create a permission set according to the template in the 'templates/permissionsets/' with the tag 'SSOPipeline:true'.
+# With update=False only the permission set is created, and the caller sets the other fields
+def create_permission_set(permissionSet, update=True):
+    client = clients.get_client('sso-admin')
+    
+    # Create permission set
+    try:
+        response = client.create_permission_set(
+            Name=permissionSet['Name'],
+            Description=permissionSet['Description'],
+            InstanceArn=ssoInstanceArn,
+            SessionDuration=permissionSet['SessionDuration'],
+            Tags=[
+                {
+                    'Key': 'SSOPipeline',
+                    'Value': 'true'
+                },
+            ]
+        )
+        log.info(f"[PS: {permissionSet['Name']}] " + "Successfully created the Permission Set")
+    except Exception as e:
+        log.error('It was not possible to create the Permission Set. Reason: ' + str(e))
+        raise PermissionSetError(str(e))
+
+    permissionSetArn = response['PermissionSet']['PermissionSetArn']
+    if update:
+        update_permission_set(permissionSet, permissionSetArn)
+    return permissionSetArn
+
+###########################
+## DELETE PERMISSION SET ## 
+###########################
+# This method will delete the permission set that was deleted from the folder 'templates/permissionsets/' of the repository
+def delete_permission_set(permissionSetArn, permissionSetName):
+    client = clients.get_client('sso-admin')
+    
+    # Update general information
+    try:
+        response = client.delete_permission_set(
+            InstanceArn=ssoInstanceArn,
+            PermissionSetArn=permissionSetArn
+        )
+        log.info(f"[PS: {permissionSetName}] " + "Permission Set was deleted: " + str(permissionSetArn))
+    except Exception as e:
+        log.error(f"[PS: {permissionSetName}] " + 'It was not possible to delete Permission Set. Reason: ' + str(e))
+        raise PermissionSetError(str(e))
+    
+    return True
+
+# Applies a single change (CREATE, UPDATE or DELETE) to one permission set and returns its ARN
+def reconcile_permission_set(action, permissionSetName, permissionSet, permissionSetArn):
+    if action == 'UPDATE':
+        log.info(f"[PS: {permissionSetName}] " + "Permission set already exists in AWS SSO, so it will be UPDATED.")
+        update_permission_set(permissionSet, permissionSetArn)
+    elif action == 'CREATE':
+        log.info(f"[PS: {permissionSetName}] " + "Permission set doesn\'t exist in AWS SSO, so it will be CREATED.")
+        permissionSetArn = create_permission_set(permissionSet)
+    else:
+        log.info(f"[PS: {permissionSetName}] " + " Permission set was not found in the repository, so it will be DELETED")
+        delete_permission_set(permissionSetArn, permissionSetName)
+    return permissionSetArn
+
+# This method will compare both current permission sets (implemented in the AWS SSO with the tag SSOpipeline) 
+# with the permission sets in the repository and modify, create or delete what is required. The repository will always be the source of truth.
+# Each permission set is independent from the others, so with more than one worker they are reconciled in parallel.
+# In incremental mode, permission sets whose SSOPipelineHash tag matches the hash of the template are not touched.
+# Returns a dictionary with the action, the ARN and the result (SUCCEEDED or FAILED) of each permission set.
+def define_permissionset_change(currentPermissionSets, repositoryPermissionSets, workers=1, incremental=False):
+    changes = []
+    unchanged = 0
+
+    # UPDATE and CREATE permission sets
+    for eachRepositoryPermissionSet in repositoryPermissionSets:
+        permissionSet = repositoryPermissionSets[eachRepositoryPermissionSet]
+        if permissionSet['Name'] in currentPermissionSets:
+            currentHash = currentPermissionSetTags.get(permissionSet['Name'], {}).get(discovery.HASH_TAG)
+            if incremental and currentHash == permissionset_state.permission_set_hash(permissionSet):
+                unchanged += 1
+                continue
+            changes.append(('UPDATE', permissionSet['Name'], permissionSet, currentPermissionSets[permissionSet['Name']]))
+        else:
+            changes.append(('CREATE', permissionSet['Name'], permissionSet, None))
+
+    # DELETE permission sets
+    for eachCurrentPermissionSet in currentPermissionSets:
+        if eachCurrentPermissionSet not in repositoryPermissionSets:
+            changes.append(('DELETE', eachCurrentPermissionSet, None, currentPermissionSets[eachCurrentPermissionSet]))
+
+    if incremental:
+        log.info(f"Incremental mode: {unchanged} permission sets have no template changes and will not be touched")
+
+    return execute_permissionset_changes(changes, reconcile_permission_set, workers)
+
+# Runs the function for each change (action, name, content, ARN). The function returns the ARN of the permission set.
+# Returns a dictionary with the action, the ARN and the result (SUCCEEDED or FAILED) of each permission set.
+def execute_permissionset_changes(changes, reconcile, workers=1):
+    results = {}
+
+    # Serial mode stops on the first error, as it always did
+    if workers <= 1:
+        for eachChange in changes:
+            permissionSetArn = reconcile(*eachChange)
+            results[eachChange[1]] = {'Action': eachChange[0], 'Arn': permissionSetArn, 'Status': 'SUCCEEDED'}
+        return results
+
+    log.info(f"Reconciling {len(changes)} permission sets with {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(reconcile, *eachChange): eachChange for eachChange in changes}
+        for future in as_completed(futures):
+            action, permissionSetName = futures[future][0], futures[future][1]
+            try:
+                permissionSetArn = future.result()
+                results[permissionSetName] = {'Action': action, 'Arn': permissionSetArn, 'Status': 'SUCCEEDED'}
+            except Exception as error:
+                log.error(f"[PS: {permissionSetName}] " + f"It was not possible to {action.lower()} the permission set. Reason: " + str(error))
+                results[permissionSetName] = {'Action': action, 'Arn': futures[future][3], 'Status': 'FAILED', 'Reason': str(error)}
+
+    return results
+
+# Saves the hash of the template in the SSOPipelineHash tag of each permission set that was created or updated successfully,
+# so the next --incremental run can skip it. A failure here is not fatal: the permission set is just updated again next time.
+# contentHashes has the hash of the template of each permission set, by name.
+def tag_permissionset_hashes(results, contentHashes, failedProvisioning, workers=1):
+    client = clients.get_client('sso-admin')
+
+    toTag = []
+    for permissionSetName, result in results.items():
+        if result['Action'] == 'DELETE' or result['Status'] != 'SUCCEEDED' or permissionSetName in failedProvisioning:
+            continue
+        contentHash = contentHashes[permissionSetName]
+        if currentPermissionSetTags.get(permissionSetName, {}).get(discovery.HASH_TAG) != contentHash:
+            toTag.append((permissionSetName, result['Arn'], contentHash))
+
+    def tag(permissionSetName, permissionSetArn, contentHash):
+        try:
+            client.tag_resource(InstanceArn=ssoInstanceArn, ResourceArn=permissionSetArn, Tags=[{'Key': discovery.HASH_TAG, 'Value': contentHash}])
+        except Exception as error:
+            log.warning(f"[PS: {permissionSetName}] " + "It was not possible to save the template hash. The permission set will be updated again in the next run. Reason: " + str(error))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(lambda eachTag: tag(*eachTag), toTag))
+
+# Logs one line per failed permission set and returns the number of failures
+def report_permissionset_results(results):
+    failed = {name: result for name, result in results.items() if result['Status'] == 'FAILED'}
+    log.info(f"{len(results) - len(failed)} of {len(results)} permission set changes succeeded")
+    for eachPermissionSet in sorted(failed):
+        log.error(f"[PS: {eachPermissionSet}] [{failed[eachPermissionSet]['Action']}] FAILED: " + failed[eachPermissionSet]['Reason'])
+    return len(failed)
+
+# Returns the permission sets managed by the pipeline after the changes: the ones found in AWS SSO,
+# plus the ones created and minus the ones deleted successfully
+def managed_permissionset_arns(currentPermissionSets, results):
+    permissionSetArns = dict(currentPermissionSets)
+    for permissionSetName, result in results.items():
+        if result['Status'] != 'SUCCEEDED':
+            continue
+        if result['Action'] == 'CREATE':
+            permissionSetArns[permissionSetName] = result['Arn']
+        elif result['Action'] == 'DELETE':
+            permissionSetArns.pop(permissionSetName, None)
+    return permissionSetArns
+
+###################
+## PLAN (--plan) ##
+###################
+# Writes the changes needed to make the managed permission sets match the templates. Nothing is changed in AWS SSO.
+# In incremental mode, permission sets whose SSOPipelineHash tag matches the template are not read nor planned.
+def plan_permissionset_changes(currentPermissionSets, repositoryPermissionSets, path):
+    names = []
+    for name in sorted(repositoryPermissionSets):
+        if name not in currentPermissionSets:
+            continue
+        currentHash = currentPermissionSetTags.get(name, {}).get(discovery.HASH_TAG)
+        if args.incremental and currentHash == permissionset_state.permission_set_hash(repositoryPermissionSets[name]):
+            continue
+        names.append(name)
+
+    try:
+        with metrics.phase('snapshot'):
+            workers = max(args.workers, SNAPSHOT_WORKERS)
+            log.info(f"Reading {len(names)} permission sets with {workers} workers")
+            currentStates = permissionset_state.read_permission_set_states(clients.get_client('sso-admin'), ssoInstanceArn,
+                currentPermissionSets, currentPermissionSetDescriptions, names, workers)
+    except Exception as error:
+        log.error('It was not possible to read the current Permission Sets. Reason: ' + str(error))
+        exit(1)
+
+    plan = permissionset_plan.build_plan(ssoInstanceArn, currentPermissionSets, currentStates, repositoryPermissionSets)
+    permissionset_plan.write_plan(plan, path)
+    for eachChange in plan['Changes']:
+        log.info('[PLAN] ' + permissionset_plan.describe_change(eachChange))
+    log.info(f"{len(plan['Changes'])} permission set changes planned and written to {path}")
+    return plan
+
+###############################
+## APPLY PLAN (--apply-plan) ##
+###############################
+# Applies one change of the plan. Only the fields listed in the plan are changed, so the permission set is not read
+def apply_planned_change(action, permissionSetName, change, permissionSetArn):
+    client = clients.get_client('sso-admin')
+    if action == 'DELETE':
+        log.info(f"[PS: {permissionSetName}] " + "Permission set is not in the plan templates, so it will be DELETED")
+        delete_permission_set(permissionSetArn, permissionSetName)
+        return permissionSetArn
+
+    permissionSet = permissionset_plan.template_from_state(permissionSetName, change['Desired'])
+    if action == 'CREATE':
+        log.info(f"[PS: {permissionSetName}] " + "Permission set will be CREATED as planned.")
+        permissionSetArn = create_permission_set(permissionSet, update=False)
+    else:
+        log.info(f"[PS: {permissionSetName}] " + "Permission set will be UPDATED as planned.")
+    if change['Changes']:
+        apply_permission_set_differences(permissionSet, permissionSetArn, client, change['Changes'], change['Reprovision'])
+    return permissionSetArn
+
+# Runs the permission sets stage. The permission sets managed by the pipeline after the changes are saved in the state,
+# so the assignments stage of the same run doesn't need to list them again. Returns True when it only wrote a plan
+def run(arguments, state):
+    print("##########################################")
+    print("# Starting AWS SSO Permission Set Script #")
+    print("##########################################\n")
+    
+
+    # Put the SSOInstanceArn in a global variable to be used latter on in the code
+    global args
+    global ssoInstanceArn
+    global provisioningTracker
+    global currentPermissionSetTags
+    args = argparse.Namespace(**vars(arguments))
+    if args.workers is None:
+        args.workers = DEFAULT_WORKERS
+
+    # Get Identity Store and SSO Instance ARN
+    sso_client = clients.get_client('sso-admin')
+    ssoInstanceArn = state.instance()['InstanceArn']
+    provisioningTracker = provisioning.ProvisioningTracker(sso_client, ssoInstanceArn)
+
+    if args.applyPlanFile:
+        # The plan already has everything needed, so neither the permission sets nor the templates are read
+        try:
+            plan = permissionset_plan.load_plan(args.applyPlanFile)
+        except Exception as error:
+            log.error(f"It was not possible to load the plan {args.applyPlanFile}. Reason: " + str(error))
+            exit(1)
+        if plan['InstanceArn'] != ssoInstanceArn:
+            log.error(f"The plan was created for the instance {plan['InstanceArn']}, not for {ssoInstanceArn}")
+            exit(1)
+        currentPermissionSets = plan['Current']
+        currentPermissionSetTags = {}
+        contentHashes = {eachChange['Name']: eachChange['Hash'] for eachChange in plan['Changes'] if 'Hash' in eachChange}
+        changes = [(eachChange['Action'], eachChange['Name'], eachChange, eachChange.get('Arn')) for eachChange in plan['Changes']]
+        log.info(f"Applying {len(changes)} permission set changes from the plan {args.applyPlanFile}")
+        try:
+            with metrics.phase('apply-plan'):
+                results = execute_permissionset_changes(changes, apply_planned_change, args.workers)
+        except PermissionSetError:
+            exit(1)
+    else:
+        with metrics.phase('discovery'):
+            currentPermissionSets = get_current_permissionset_list()    
+        with metrics.phase('load-templates'):
+            repositoryPermissionSets = get_repository_permissionset_list()
+
+        if args.planFile:
+            plan_permissionset_changes(currentPermissionSets, repositoryPermissionSets, args.planFile)
+            return True
+
+        try:
+            with metrics.phase('reconcile'):
+                results = define_permissionset_change(currentPermissionSets, repositoryPermissionSets, args.workers, args.incremental)
+        except PermissionSetError:
+            exit(1)
+        contentHashes = {name: permissionset_state.permission_set_hash(repositoryPermissionSets[name]) for name in repositoryPermissionSets}
+
+    failures = report_permissionset_results(results)
+
+    # Wait once for all the permission sets that were re-provisioned
+    provisioningResults = {}
+    if args.provisioningTimeout > 0:
+        with metrics.phase('provisioning-wait'):
+            provisioningResults = provisioningTracker.wait(args.provisioningTimeout)
+        failures += provisioning.report_provisioning_results(provisioningResults)
+
+    failedProvisioning = {name for name, result in provisioningResults.items() if result['Status'] != 'SUCCEEDED'}
+    with metrics.phase('tag-hashes'):
+        tag_permissionset_hashes(results, contentHashes, failedProvisioning, args.workers)
+
+    state.permissionSetArns = managed_permissionset_arns(currentPermissionSets, results)
+
+    if failures > 0:
+        exit(1)
+    log.info('Congrats! Permission sets script finished without errors! :)')
@@ -0,0 +1,264 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Offline Policy Linter
+## +-----------------------------------
+
+import bisect
+import fnmatch
+import gzip
+import json
+import logging
+import re
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import botocore
+import botocore.session
+
+log = logging.getLogger(__name__)
+
+CATALOG_VERSION = 1
+
+# Public JSON version of the Service Authorization Reference (no AWS credentials needed)
+SERVICE_REFERENCE_URL = 'https://servicereference.us-east-1.amazonaws.com/'
+
+# Maximum size of the inline policy of a permission set, whitespace not included
+MAX_INLINE_POLICY_SIZE = 32768
+
+POLICY_VERSIONS = ('2012-10-17', '2008-10-17')
+STATEMENT_FIELDS = ('Sid', 'Effect', 'Action', 'NotAction', 'Resource', 'NotResource', 'Condition')
+ACTION_PATTERN = re.compile(r'^[a-zA-Z0-9-]+:[a-zA-Z0-9*?]+$')
+
+CONDITION_OPERATORS = {
+    'StringEquals', 'StringNotEquals', 'StringEqualsIgnoreCase', 'StringNotEqualsIgnoreCase', 'StringLike', 'StringNotLike',
+    'NumericEquals', 'NumericNotEquals', 'NumericLessThan', 'NumericLessThanEquals', 'NumericGreaterThan', 'NumericGreaterThanEquals',
+    'DateEquals', 'DateNotEquals', 'DateLessThan', 'DateLessThanEquals', 'DateGreaterThan', 'DateGreaterThanEquals',
+    'Bool', 'BinaryEquals', 'IpAddress', 'NotIpAddress', 'ArnEquals', 'ArnLike', 'ArnNotEquals', 'ArnNotLike', 'Null'
+}
+
+# Global condition keys known when the linter was written (lower case). Keys ending with '/' take a tag key or similar suffix.
+# The global keys listed by the services of the catalog are added to them. Other aws: keys are only reported as warnings,
+# as AWS adds new global keys from time to time
+GLOBAL_CONDITION_KEYS = {key.lower() for key in (
+    'aws:CalledVia', 'aws:CalledViaFirst', 'aws:CalledViaLast', 'aws:CurrentTime', 'aws:EpochTime', 'aws:FederatedProvider',
+    'aws:MultiFactorAuthAge', 'aws:MultiFactorAuthPresent', 'aws:PrincipalAccount', 'aws:PrincipalArn', 'aws:PrincipalIsAWSService',
+    'aws:PrincipalOrgID', 'aws:PrincipalOrgPaths', 'aws:PrincipalServiceName', 'aws:PrincipalServiceNamesList', 'aws:PrincipalTag/',
+    'aws:PrincipalType', 'aws:Referer', 'aws:RequestedRegion', 'aws:RequestTag/', 'aws:ResourceAccount', 'aws:ResourceOrgID',
+    'aws:ResourceOrgPaths', 'aws:ResourceTag/', 'aws:SecureTransport', 'aws:SourceAccount', 'aws:SourceArn', 'aws:SourceIdentity',
+    'aws:SourceIp', 'aws:SourceOrgID', 'aws:SourceOrgPaths', 'aws:SourceVpc', 'aws:SourceVpcArn', 'aws:SourceVpce', 'aws:TagKeys',
+    'aws:TokenIssueTime', 'aws:userid', 'aws:username', 'aws:UserAgent', 'aws:ViaAWSService', 'aws:VpcSourceIp', 'aws:VpceAccount',
+    'aws:VpceOrgID', 'aws:VpceOrgPaths', 'aws:Ec2InstanceSourceVpc', 'aws:Ec2InstanceSourcePrivateIPv4', 'aws:AssumedRoot'
+)}
+
+# Index of the actions and condition keys of each service. Actions are kept sorted (lower case) per service prefix,
+# so a wildcard is resolved with a binary search on its literal prefix followed by a match on that range only.
+# An empty catalog (no catalog file) only disables the checks of action names and service condition keys.
+# In an incomplete catalog (see build_catalog_from_botocore) the actions that are not found are only warnings.
+class ActionCatalog:
+    def __init__(self, catalog):
+        self.source = catalog.get('Source', 'unknown')
+        self.generatedAt = catalog.get('GeneratedAt', 'unknown date')
+        self.complete = catalog.get('Complete', True)
+        self.actions = {}
+        self.conditionKeys = {}
+        self.globalConditionKeys = set(GLOBAL_CONDITION_KEYS)
+        for prefix, service in catalog['Services'].items():
+            self.actions[prefix.lower()] = sorted(action.lower() for action in service['Actions'])
+            if 'ConditionKeys' in service:
+                self.conditionKeys[prefix.lower()] = {condition_key_name(key) for key in service['ConditionKeys']}
+                self.globalConditionKeys.update(condition_key_name(key) for key in service['ConditionKeys'] if key.lower().startswith('aws:'))
+
+    def is_empty(self):
+        return not self.actions
+
+    def has_service(self, prefix):
+        return prefix.lower() in self.actions
+
+    # Number of actions of the service matching the action name, which may have '*' and '?' wildcards
+    def count_matches(self, prefix, actionName):
+        actions = self.actions.get(prefix.lower(), [])
+        pattern = actionName.lower()
+        literal = re.split(r'[*?]', pattern, 1)[0]
+        if literal == pattern:
+            position = bisect.bisect_left(actions, pattern)
+            return 1 if position < len(actions) and actions[position] == pattern else 0
+
+        start = bisect.bisect_left(actions, literal)
+        end = bisect.bisect_left(actions, literal + '\uffff')
+        return sum(1 for action in actions[start:end] if fnmatch.fnmatchcase(action, pattern))
+
+    # Returns None when the service of the key is not in the catalog or has no condition keys in it
+    def has_condition_key(self, key):
+        prefix = key.split(':', 1)[0].lower()
+        if prefix not in self.conditionKeys:
+            return None
+        return condition_key_name(key) in self.conditionKeys[prefix]
+
+# Condition keys are case insensitive, and anything after '/' is a variable part (e.g. s3:ResourceTag/${TagKey})
+def condition_key_name(key):
+    key = key.lower()
+    return key.split('/', 1)[0] + '/' if '/' in key else key
+
+def load_catalog(path):
+    if path is None:
+        return ActionCatalog(new_catalog('none', {}))
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        catalog = json.load(f)
+    if catalog.get('Version') != CATALOG_VERSION:
+        raise ValueError(f"Unsupported action catalog version in {path}: {catalog.get('Version')}")
+    return ActionCatalog(catalog)
+
+def write_catalog(catalog, path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt') as f:
+        json.dump(catalog, f, separators=(',', ':'), sort_keys=True)
+    log.info(f"Action catalog with {len(catalog['Services'])} services written to {path}")
+
+def new_catalog(source, services, complete=True):
+    return {
+        'Version': CATALOG_VERSION,
+        'Source': source,
+        'GeneratedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'Complete': complete,
+        'Services': services
+    }
+
+def fetch_json(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return json.loads(response.read())
+
+# Builds a complete catalog (all actions and condition keys) from the Service Authorization Reference
+def build_catalog_from_service_reference(workers=10):
+    services = fetch_json(SERVICE_REFERENCE_URL)
+    catalog = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for service in executor.map(lambda eachService: fetch_json(eachService['url']), services):
+            catalog[service['Name']] = {
+                'Actions': sorted(action['Name'] for action in service.get('Actions', [])),
+                'ConditionKeys': sorted(key['Name'] for key in service.get('ConditionKeys', []))
+            }
+    return new_catalog('service-reference', catalog)
+
+# Builds a catalog from the API operations of the service models installed with botocore, without network access.
+# IAM actions that are not API operations (e.g. iam:PassRole), services without an SDK and condition keys are missing,
+# so the catalog is marked as incomplete
+def build_catalog_from_botocore():
+    session = botocore.session.get_session()
+    catalog = {}
+    for serviceName in session.get_available_services():
+        model = session.get_service_model(serviceName)
+        prefix = model.signing_name or model.endpoint_prefix
+        catalog.setdefault(prefix, set()).update(model.operation_names)
+    return new_catalog(f'botocore-{botocore.__version__}', {prefix: {'Actions': sorted(actions)} for prefix, actions in catalog.items()}, complete=False)
+
+def as_list(value):
+    return value if isinstance(value, list) else [value]
+
+def lint_action(catalog, action, field):
+    if action == '*':
+        return []
+    if not isinstance(action, str) or not ACTION_PATTERN.match(action):
+        return [('ERROR', f"{field} '{action}' is not in the format service:action")]
+    if catalog.is_empty():
+        return []
+
+    prefix, actionName = action.split(':', 1)
+    findingType = 'ERROR' if catalog.complete else 'WARNING'
+    if not catalog.has_service(prefix):
+        return [(findingType, f"{field} '{action}': the service prefix '{prefix}' was not found in the action catalog")]
+    if catalog.count_matches(prefix, actionName) == 0:
+        if '*' in actionName or '?' in actionName:
+            return [(findingType, f"{field} '{action}' doesn't match any action of the service '{prefix}'")]
+        return [(findingType, f"{field} '{action}' was not found in the action catalog")]
+    return []
+
+def lint_condition(catalog, condition):
+    if not isinstance(condition, dict):
+        return [('ERROR', "Condition must be an object")]
+
+    findings = []
+    for operator, keys in condition.items():
+        baseOperator = operator.split(':', 1)[1] if operator.startswith(('ForAllValues:', 'ForAnyValue:')) else operator
+        if baseOperator.endswith('IfExists') and baseOperator != 'IfExists':
+            baseOperator = baseOperator[:-len('IfExists')]
+        if baseOperator not in CONDITION_OPERATORS:
+            findings.append(('ERROR', f"Unknown condition operator '{operator}'"))
+        if not isinstance(keys, dict):
+            findings.append(('ERROR', f"Condition operator '{operator}' must have an object of condition keys"))
+            continue
+
+        for key in keys:
+            if ':' not in key:
+                findings.append(('ERROR', f"Condition key '{key}' is not in the format service:key"))
+            elif key.lower().startswith('aws:'):
+                if condition_key_name(key) not in catalog.globalConditionKeys:
+                    findings.append(('WARNING', f"Unknown global condition key '{key}'"))
+            elif catalog.has_condition_key(key) is False:
+                findings.append(('ERROR', f"Condition key '{key}' was not found in the action catalog"))
+    return findings
+
+def lint_statement(catalog, statement):
+    if not isinstance(statement, dict):
+        return [('ERROR', "Statement must be an object")]
+
+    findings = []
+    for field in statement:
+        if field == 'Principal' or field == 'NotPrincipal':
+            findings.append(('ERROR', f"{field} is not supported in the policy of a permission set"))
+        elif field not in STATEMENT_FIELDS:
+            findings.append(('ERROR', f"Unknown statement field '{field}'"))
+
+    if statement.get('Effect') not in ('Allow', 'Deny'):
+        findings.append(('ERROR', f"Effect must be Allow or Deny, found '{statement.get('Effect')}'"))
+    if ('Action' in statement) == ('NotAction' in statement):
+        findings.append(('ERROR', "Statement must have either Action or NotAction"))
+    if ('Resource' in statement) == ('NotResource' in statement):
+        findings.append(('ERROR', "Statement must have either Resource or NotResource"))
+
+    for field in ('Action', 'NotAction'):
+        for action in as_list(statement.get(field, [])):
+            findings.extend(lint_action(catalog, action, field))
+    if 'Condition' in statement:
+        findings.extend(lint_condition(catalog, statement['Condition']))
+    return findings
+
+# Checks the structure, action names, wildcards, condition keys and size of an identity policy without calling AWS.
+# Returns a list of (findingType, message), findingType being ERROR or WARNING as in the Access Analyzer findings.
+def lint_policy(catalog, policy):
+    if not isinstance(policy, dict):
+        return [('ERROR', "Policy must be an object")]
+
+    findings = []
+    size = len(json.dumps(policy, separators=(',', ':')))
+    if size > MAX_INLINE_POLICY_SIZE:
+        findings.append(('ERROR', f"Policy has {size} characters, more than the maximum of {MAX_INLINE_POLICY_SIZE} of an inline policy"))
+    if policy.get('Version') not in POLICY_VERSIONS:
+        findings.append(('WARNING', f"Policy Version should be 2012-10-17, found '{policy.get('Version')}'"))
+    if 'Statement' not in policy:
+        findings.append(('ERROR', "Policy has no Statement"))
+
+    statements = as_list(policy.get('Statement', []))
+    sids = [statement['Sid'] for statement in statements if isinstance(statement, dict) and 'Sid' in statement]
+    if len(sids) > len(set(sids)):
+        findings.append(('ERROR', "Statement Sids must be unique"))
+
+    for index, statement in enumerate(statements):
+        label = statement.get('Sid', index) if isinstance(statement, dict) else index
+        findings.extend((findingType, f"Statement {label}: {message}") for findingType, message in lint_statement(catalog, statement))
+    return findings
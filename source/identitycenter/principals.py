@@ -0,0 +1,103 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS Identity Store Principal Resolver
+## +-----------------------------------
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# Number of principals looked up in parallel
+DEFAULT_WORKERS = 10
+
+# When there are more distinct principals of a type than this, all groups (or users) are listed once
+# to build a name to ID index, instead of one filtered lookup per principal
+BULK_THRESHOLD = 100
+
+# Attribute used to find each principal type by name, the list operation and the field with the ID
+PRINCIPAL_TYPES = {
+    'GROUP': {'AttributePath': 'DisplayName', 'Operation': 'list_groups', 'Items': 'Groups', 'Id': 'GroupId'},
+    'USER': {'AttributePath': 'UserName', 'Operation': 'list_users', 'Items': 'Users', 'Id': 'UserId'}
+}
+
+# Returns the ID of the principal or None if it doesn't exist
+def lookup_principal(client, identityStoreId, principalName, principalType):
+    principalType = PRINCIPAL_TYPES[principalType]
+    response = getattr(client, principalType['Operation'])(
+        IdentityStoreId=identityStoreId,
+        Filters=[
+            {
+                'AttributePath': principalType['AttributePath'],
+                'AttributeValue': principalName
+            },
+        ]
+    )
+    if response[principalType['Items']]:
+        return response[principalType['Items']][0][principalType['Id']]
+    return None
+
+# Lists every group or user in the identity store and returns a name to ID index
+def list_all_principals(client, identityStoreId, principalType):
+    principalType = PRINCIPAL_TYPES[principalType]
+    index = {}
+    paginator = client.get_paginator(principalType['Operation'])
+    for page in paginator.paginate(IdentityStoreId=identityStoreId):
+        for eachPrincipal in page[principalType['Items']]:
+            index[eachPrincipal[principalType['AttributePath']]] = eachPrincipal[principalType['Id']]
+    return index
+
+# Resolves the distinct (name, type) principals to their IDs. Cached IDs are used first (see cache.PersistentCache),
+# the remaining ones are looked up in parallel, or through a full listing when there are more than bulkThreshold of one type.
+# Returns a dictionary {(name, type): id} and the sorted list of (name, type) that were not found.
+def resolve_principals(client, identityStoreId, principals, workers=DEFAULT_WORKERS, bulkThreshold=BULK_THRESHOLD, persistentCache=None):
+    resolved = {}
+    unresolved = []
+    toLookup = {}
+
+    for principalName, principalType in sorted(set(principals)):
+        if principalType not in PRINCIPAL_TYPES:
+            unresolved.append((principalName, principalType))
+            continue
+        cachedId = persistentCache.get('principals', f"{principalType}:{principalName}") if persistentCache else None
+        if cachedId is not None:
+            resolved[(principalName, principalType)] = cachedId
+        else:
+            toLookup.setdefault(principalType, []).append(principalName)
+
+    found = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for principalType, names in toLookup.items():
+            if len(names) > bulkThreshold:
+                log.info(f"Listing all principals of type {principalType} to resolve {len(names)} names")
+                index = list_all_principals(client, identityStoreId, principalType)
+                ids = [index.get(eachName) for eachName in names]
+            else:
+                log.info(f"Looking up {len(names)} principals of type {principalType}")
+                ids = executor.map(lambda eachName, principalType=principalType: lookup_principal(client, identityStoreId, eachName, principalType), names)
+            for eachName, eachId in zip(names, ids):
+                found[(eachName, principalType)] = eachId
+
+    for eachPrincipal in sorted(found):
+        if found[eachPrincipal] is None:
+            unresolved.append(eachPrincipal)
+            continue
+        resolved[eachPrincipal] = found[eachPrincipal]
+        if persistentCache:
+            persistentCache.put('principals', f"{eachPrincipal[1]}:{eachPrincipal[0]}", found[eachPrincipal])
+
+    return resolved, sorted(unresolved)
@@ -0,0 +1,119 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Permission Set Provisioning Tracker
+## +-----------------------------------
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# Number of provisioning requests polled in parallel
+DEFAULT_WORKERS = 10
+
+# Delay between polling rounds. It doubles after each round (with jitter) up to the maximum
+INITIAL_DELAY = 2
+MAX_DELAY = 30
+
+# Collects the request IDs returned by provision_permission_set and waits for all of them at once.
+# Permission set provisioning happens in the background in AWS SSO, so instead of waiting after each
+# provision_permission_set call, all requests are polled together in a single overlapped wait.
+# Other asynchronous AWS SSO requests (e.g. account assignments) are tracked by subclasses that override describe().
+class ProvisioningTracker:
+    requestType = 'permission set provisioning'
+
+    def __init__(self, client, instanceArn):
+        self.client = client
+        self.instanceArn = instanceArn
+        self.pending = {}
+        self.results = {}
+        self.lock = threading.Lock()
+
+    # Registers the status returned when the request was made (e.g. 'PermissionSetProvisioningStatus' returned by
+    # provision_permission_set), under a label such as the permission set name. It can be called from several threads.
+    def add(self, label, requestStatus):
+        with self.lock:
+            self.record(label, requestStatus)
+
+    def record(self, label, requestStatus):
+        if requestStatus['Status'] == 'IN_PROGRESS':
+            self.pending[label] = requestStatus['RequestId']
+            return
+        self.pending.pop(label, None)
+        self.results[label] = {
+            'RequestId': requestStatus['RequestId'],
+            'Status': requestStatus['Status'],
+            'FailureReason': requestStatus.get('FailureReason', '')
+        }
+
+    def describe(self, label, requestId):
+        response = self.client.describe_permission_set_provisioning_status(
+            InstanceArn=self.instanceArn,
+            ProvisionPermissionSetRequestId=requestId
+        )
+        return response['PermissionSetProvisioningStatus']
+
+    # Status of one request. A request whose status cannot be checked (e.g. still throttled after the retries, or the deadline
+    # of the run was reached) is reported as FAILED with the reason, so the other requests are still waited for and reported
+    def check(self, label, requestId):
+        try:
+            return self.describe(label, requestId)
+        except Exception as error:
+            return {'RequestId': requestId, 'Status': 'FAILED', 'FailureReason': 'The status of the request could not be checked: ' + str(error)}
+
+    # Polls every pending request in parallel until all of them finish or the timeout (seconds) passes.
+    # Returns a dictionary by label with Status SUCCEEDED, FAILED or TIMED_OUT.
+    def wait(self, timeout, workers=DEFAULT_WORKERS):
+        deadline = time.monotonic() + timeout
+        delay = INITIAL_DELAY
+
+        if self.pending:
+            log.info(f"Waiting for {len(self.pending)} {self.requestType} requests (timeout: {timeout}s)")
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            while self.pending:
+                labels = list(self.pending)
+                statuses = executor.map(lambda eachLabel: self.check(eachLabel, self.pending[eachLabel]), labels)
+                with self.lock:
+                    for eachLabel, eachStatus in zip(labels, statuses):
+                        self.record(eachLabel, eachStatus)
+
+                if not self.pending:
+                    break
+                if time.monotonic() + delay > deadline:
+                    with self.lock:
+                        for eachLabel, requestId in self.pending.items():
+                            self.results[eachLabel] = {'RequestId': requestId, 'Status': 'TIMED_OUT', 'FailureReason': f'Request did not finish in {timeout} seconds'}
+                        self.pending = {}
+                    break
+
+                log.info(f"{len(self.pending)} {self.requestType} requests still in progress. Checking again in {delay}s")
+                time.sleep(delay)
+                delay = round(min(delay * 2, MAX_DELAY) * random.uniform(0.8, 1.2), 1)
+
+        return self.results
+
+# Logs one aggregated report of the provisioning results and returns the number of requests that didn't succeed
+def report_provisioning_results(results):
+    failed = {name: result for name, result in results.items() if result['Status'] != 'SUCCEEDED'}
+    log.info(f"{len(results) - len(failed)} of {len(results)} permission set provisioning requests succeeded")
+    for eachPermissionSet in sorted(failed):
+        log.error(f"[PS: {eachPermissionSet}] Provisioning {failed[eachPermissionSet]['Status']} (request {failed[eachPermissionSet]['RequestId']}): " + failed[eachPermissionSet]['FailureReason'])
+    return len(failed)
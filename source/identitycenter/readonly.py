@@ -0,0 +1,50 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Pipeline Read-Only Guard
+## +-----------------------------------
+
+import logging
+
+from identitycenter import clients
+
+log = logging.getLogger(__name__)
+
+# Operations that only read. Every other operation (Create, Delete, Put, Attach, Provision, Tag...) is blocked while the guard is on
+READ_PREFIXES = ('List', 'Describe', 'Get')
+
+class WriteBlocked(Exception):
+    pass
+
+# Whether calls are checked. The event handler is registered once per session and does nothing while it is off
+active = False
+
+def on_before_parameter_build(model, **kwargs):
+    if active and not model.name.startswith(READ_PREFIXES):
+        raise WriteBlocked(f"{model.service_model.service_name}.{model.name} was blocked: only List, Describe and Get calls are allowed in a read-only run")
+
+# Blocks every call that is not a read, before its parameters are built (so nothing is sent), for the calls made with
+# the session (by default the boto3 default session, used by the scripts)
+def enable(session=None):
+    global active
+    session = clients.get_session(session)
+    session.events.register_first('before-parameter-build', on_before_parameter_build, unique_id='identitycenter-readonly-before-parameter-build')
+    active = True
+    log.info('Read-only run: only List, Describe and Get calls are allowed')
+
+def disable():
+    global active
+    active = False
@@ -0,0 +1,178 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Assignment Target Engine
+## +-----------------------------------
+
+import re
+
+"""
+Target expressions of the assignment templates
+Root or <name>:<root id>: every account of the organization
+<name>:<account id>: one account
+<name>:<ou id>: the accounts directly under the OU
+<name>:<ou id>:*: the accounts under the OU and all its nested OUs
+A target starting with ! removes its accounts from the result, e.g. ["ou-name:ou-xxxx-yyyyyyyy:*", "!account-name:123456789012"]
+"""
+
+ACCOUNT_ID_PATTERN = re.compile(r'\d{12}')
+
+ROOT = 'ROOT'
+ACCOUNT = 'ACCOUNT'
+OU = 'OU'
+OU_NESTED = 'OU_NESTED'
+
+# Returns (excluded, kind, id) for a target expression. Raises ValueError if it is not in a valid format
+def parse_target(target):
+    excluded = target.startswith('!')
+    expression = target[1:] if excluded else target
+    if expression.upper() == 'ROOT':
+        return excluded, ROOT, None
+    if ':' not in expression:
+        raise ValueError(f"Target {target} is not in a valid format")
+    reference = expression.split(':', 1)[1]
+    if ACCOUNT_ID_PATTERN.match(expression.split(':')[1]):
+        return excluded, ACCOUNT, expression.split(':')[1]
+    if 'ou-' in reference:
+        if ':*' in reference:
+            return excluded, OU_NESTED, reference.split(':')[0]
+        return excluded, OU, reference
+    if reference.startswith('r-') or 'ROOT' in reference.upper():
+        return excluded, ROOT, None
+    raise ValueError(f"Target {target} is not in a valid format")
+
+# Tells whether a parsed target covers an account whose parents are chain (direct parent first, root last)
+def target_covers(kind, targetId, accountId, chain):
+    if kind == ROOT:
+        return True
+    if kind == ACCOUNT:
+        return targetId == accountId
+    if kind == OU_NESTED:
+        return targetId in chain
+    return targetId == chain[0]
+
+# Tells whether the target expressions of an assignment cover the account (see target_covers)
+def targets_cover(targets, accountId, chain):
+    included = False
+    for eachTarget in targets:
+        excluded, kind, targetId = parse_target(eachTarget)
+        if target_covers(kind, targetId, accountId, chain):
+            if excluded:
+                return False
+            included = True
+    return included
+
+# Resolves target expressions with set operations over a dense index of the accounts. Each account has a bit position,
+# and the accounts of each parent (directly or nested) are one integer bitset, so a list of targets is the union of
+# its targets without the union of its exclusions and without the excluded accounts (e.g. the management account).
+# The organization is only loaded (get_index) the first time an OU or the root is needed, and each distinct list of
+# targets is evaluated once.
+class TargetEngine:
+    def __init__(self, get_index, excludedAccounts=()):
+        self.get_index = get_index
+        self.index = None
+        self.accountIds = []
+        self.positions = {}
+        self.directMasks = {}
+        self.nestedMasks = {}
+        self.compiled = {}
+        self.excludedMask = 0
+        for eachAccount in excludedAccounts:
+            if eachAccount:
+                self.excludedMask |= self.bit(eachAccount)
+
+    # Bitset with only the account. Accounts named in targets but not found in the organization get a position too
+    def bit(self, accountId):
+        position = self.positions.get(accountId)
+        if position is None:
+            position = len(self.accountIds)
+            self.positions[accountId] = position
+            self.accountIds.append(accountId)
+        return 1 << position
+
+    def load_index(self):
+        if self.index is None:
+            self.index = self.get_index()
+            for parentId, accounts in self.index.accounts.items():
+                mask = 0
+                for eachAccount in accounts:
+                    mask |= self.bit(eachAccount)
+                self.directMasks[parentId] = mask
+        return self.index
+
+    def direct_mask(self, ouId):
+        self.load_index()
+        if ouId not in self.directMasks:
+            raise ValueError(f"Organizational unit {ouId} was not found in the organization")
+        return self.directMasks[ouId]
+
+    # Accounts under the parent and all its nested OUs. Children are computed before their parent, once per parent
+    def nested_mask(self, parentId):
+        index = self.load_index()
+        if parentId not in self.directMasks:
+            raise ValueError(f"Organizational unit {parentId} was not found in the organization")
+        stack = [(parentId, False)]
+        while stack:
+            eachParent, childrenDone = stack.pop()
+            if eachParent in self.nestedMasks:
+                continue
+            if childrenDone:
+                mask = self.directMasks[eachParent]
+                for eachChild in index.children[eachParent]:
+                    mask |= self.nestedMasks[eachChild]
+                self.nestedMasks[eachParent] = mask
+            else:
+                stack.append((eachParent, True))
+                stack.extend((eachChild, False) for eachChild in index.children[eachParent] if eachChild not in self.nestedMasks)
+        return self.nestedMasks[parentId]
+
+    def target_mask(self, kind, targetId):
+        if kind == ACCOUNT:
+            return self.bit(targetId)
+        if kind == OU:
+            return self.direct_mask(targetId)
+        if kind == OU_NESTED:
+            return self.nested_mask(targetId)
+        return self.nested_mask(self.load_index().rootId)
+
+    # Bitset of the accounts covered by the targets
+    def resolve_mask(self, targets):
+        key = tuple(targets)
+        if key not in self.compiled:
+            included = 0
+            excluded = self.excludedMask
+            for eachTarget in targets:
+                isExcluded, kind, targetId = parse_target(eachTarget)
+                if isExcluded:
+                    excluded |= self.target_mask(kind, targetId)
+                else:
+                    included |= self.target_mask(kind, targetId)
+            self.compiled[key] = included & ~excluded
+        return self.compiled[key]
+
+    # Account IDs of a bitset, in the order of their positions
+    def accounts(self, mask):
+        bits = bin(mask)[:1:-1]
+        accountList = []
+        position = bits.find('1')
+        while position != -1:
+            accountList.append(self.accountIds[position])
+            position = bits.find('1', position + 1)
+        return accountList
+
+    # Account IDs covered by the targets, without duplicates and without the excluded accounts
+    def resolve(self, targets):
+        return self.accounts(self.resolve_mask(targets))
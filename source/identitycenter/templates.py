@@ -0,0 +1,285 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Template Loader
+## +-----------------------------------
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# Files read in parallel
+DEFAULT_WORKERS = 10
+
+# Schemas of the template files. Only the features used here are supported (see compile_schema):
+# type, required, properties, items, enum, pattern, minItems and allowEmpty (an object with no keys is valid,
+# e.g. "PermissionBoundary": {}). Keys that are not in properties are allowed.
+PERMISSION_SET_SCHEMA = {
+    'type': 'object',
+    'required': ['Name', 'Description', 'SessionDuration'],
+    'properties': {
+        'Name': {'type': 'string', 'pattern': r'^[\w+=,.@-]{1,32}$'},
+        'Description': {'type': 'string'},
+        'SessionDuration': {'type': 'string', 'pattern': r'^PT(?!$)(\d+H)?(\d+M)?$'},
+        'RelayState': {'type': 'string'},
+        'ManagedPolicies': {'type': 'array', 'items': {'type': 'string', 'pattern': r'^arn:[\w-]+:iam::aws:policy/'}},
+        'CustomerManagedPolicies': {'type': 'array', 'items': {'type': 'string'}},
+        'CustomPolicy': {'type': 'object', 'allowEmpty': True, 'required': ['Statement']},
+        'PermissionBoundary': {
+            'type': 'object',
+            'allowEmpty': True,
+            'required': ['PolicyType', 'Policy'],
+            'properties': {
+                'PolicyType': {'type': 'string', 'enum': ['AWS', 'CUSTOMER']},
+                'Policy': {'type': 'string'}
+            }
+        }
+    }
+}
+
+ASSIGNMENT_FILE_SCHEMA = {
+    'type': 'object',
+    'required': ['Assignments'],
+    'properties': {
+        'Assignments': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'required': ['SID', 'Target', 'PrincipalType', 'PrincipalId', 'PermissionSetName'],
+                'properties': {
+                    'SID': {'type': 'string'},
+                    'Target': {'type': 'array', 'minItems': 1, 'items': {'type': 'string', 'pattern': r'\S'}},
+                    'PrincipalType': {'type': 'string', 'enum': ['GROUP', 'USER']},
+                    'PrincipalId': {'type': 'string', 'pattern': r'\S'},
+                    'PermissionSetName': {'type': 'string', 'pattern': r'\S'}
+                }
+            }
+        }
+    }
+}
+
+JSON_TYPES = {
+    'object': (dict,),
+    'array': (list,),
+    'string': (str,),
+    'integer': (int,),
+    'boolean': (bool,)
+}
+
+# Turns a schema into a function check(value, path, errors) that appends (path, message) for each problem.
+# The schema is walked once here, so validating a file only runs the checks that apply to it.
+def compile_schema(schema):
+    checks = []
+
+    if 'type' in schema:
+        expectedType = schema['type']
+        pythonTypes = JSON_TYPES[expectedType]
+        def check_type(value, path, errors):
+            if not isinstance(value, pythonTypes) or (expectedType == 'integer' and isinstance(value, bool)):
+                errors.append((path, f"must be of type {expectedType}"))
+                return False
+            return True
+        checks.append(check_type)
+
+    if 'enum' in schema:
+        allowed = schema['enum']
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append((path, f"must be one of {', '.join(allowed)}, not {json.dumps(value)}"))
+            return True
+        checks.append(check_enum)
+
+    if 'pattern' in schema:
+        pattern = re.compile(schema['pattern'])
+        def check_pattern(value, path, errors):
+            if not pattern.search(value):
+                errors.append((path, f"{json.dumps(value)} doesn't match {schema['pattern']}"))
+            return True
+        checks.append(check_pattern)
+
+    if 'minItems' in schema:
+        minItems = schema['minItems']
+        def check_min_items(value, path, errors):
+            if len(value) < minItems:
+                errors.append((path, f"must have at least {minItems} item(s)"))
+            return True
+        checks.append(check_min_items)
+
+    if 'items' in schema:
+        checkItem = compile_schema(schema['items'])
+        def check_items(value, path, errors):
+            for index, item in enumerate(value):
+                checkItem(item, path + [index], errors)
+            return True
+        checks.append(check_items)
+
+    if schema.get('type') == 'object':
+        allowEmpty = schema.get('allowEmpty', False)
+        required = schema.get('required', [])
+        properties = {name: compile_schema(propertySchema) for name, propertySchema in schema.get('properties', {}).items()}
+        def check_object(value, path, errors):
+            if allowEmpty and not value:
+                return True
+            for name in required:
+                if name not in value:
+                    errors.append((path, f"the required field {name} is missing"))
+            for name, checkProperty in properties.items():
+                if name in value:
+                    checkProperty(value[name], path + [name], errors)
+            return True
+        checks.append(check_object)
+
+    # Checks stop at the first failed type check, so the others never see a value of the wrong type
+    def check(value, path, errors):
+        for eachCheck in checks:
+            if not eachCheck(value, path, errors):
+                return
+    return check
+
+checkPermissionSet = compile_schema(PERMISSION_SET_SCHEMA)
+checkAssignmentFile = compile_schema(ASSIGNMENT_FILE_SCHEMA)
+
+# Returns the line of the value at path (a list of keys and indexes) in the JSON text, or of the closest parent
+# that exists. It is only used for the files with errors, so the files without errors are parsed only by json.loads.
+def locate_line(text, path):
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r'\s*')
+
+    def skip(index):
+        return whitespace.match(text, index).end()
+
+    # Returns the index where the value starting at index ends. If the value is on the path, its line is found first
+    def walk(index, remaining):
+        index = skip(index)
+        if not remaining:
+            return None, index
+        if text[index] == '{':
+            index = skip(index + 1)
+            while text[index] != '}':
+                key, index = json.decoder.scanstring(text, index + 1)
+                index = skip(skip(index) + 1)
+                if key == remaining[0]:
+                    found, index = walk(index, remaining[1:])
+                    return found if found is not None else index, index
+                index = end_of_value(index)
+                index = skip(index)
+                if text[index] == ',':
+                    index = skip(index + 1)
+        elif text[index] == '[':
+            index = skip(index + 1)
+            position = 0
+            while text[index] != ']':
+                if position == remaining[0]:
+                    found, index = walk(index, remaining[1:])
+                    return found if found is not None else index, index
+                index = skip(end_of_value(index))
+                if text[index] == ',':
+                    index = skip(index + 1)
+                position += 1
+        return None, index
+
+    def end_of_value(index):
+        return decoder.raw_decode(text, index)[1]
+
+    try:
+        found, index = walk(0, list(path))
+        position = found if found is not None else index
+    except (ValueError, IndexError):
+        position = 0
+    return text.count('\n', 0, position) + 1
+
+def format_path(path):
+    return ''.join(f'[{eachKey}]' if isinstance(eachKey, int) else f'.{eachKey}' for eachKey in path).lstrip('.') or '(file)'
+
+# Parse cache shared by every load of the process (e.g. the validation, permission sets and assignments stages of 'all').
+# It is kept in memory only: stages run as separate processes (as in the pipeline, one CodeBuild project per stage) parse the files again.
+# Entries are reused while the size and modification time of the file don't change, or when its content hash is the same.
+cachedFiles = {}
+cacheLock = threading.Lock()
+
+# Reads, parses and validates one file. Returns (data, errors), errors as (line, message)
+def load_file(path, check):
+    stat = os.stat(path)
+    with cacheLock:
+        cached = cachedFiles.get(path)
+    if cached and cached['Size'] == stat.st_size and cached['Mtime'] == stat.st_mtime_ns:
+        return cached['Data'], cached['Errors']
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha1(content).hexdigest()
+    if cached and cached['Hash'] == digest:
+        data, errors = cached['Data'], cached['Errors']
+    else:
+        try:
+            text = content.decode('utf-8-sig')
+            data = json.loads(text)
+            schemaErrors = []
+            check(data, [], schemaErrors)
+            errors = [(locate_line(text, eachPath), f"{format_path(eachPath)}: {message}") for eachPath, message in schemaErrors]
+        except json.JSONDecodeError as error:
+            data, errors = None, [(error.lineno, f"invalid JSON: {error.msg} (column {error.colno})")]
+        except UnicodeDecodeError as error:
+            data, errors = None, [(content[:error.start].count(b'\n') + 1, f"not valid UTF-8: {error.reason} (byte {error.start})")]
+
+    with cacheLock:
+        cachedFiles[path] = {'Size': stat.st_size, 'Mtime': stat.st_mtime_ns, 'Hash': digest, 'Data': data, 'Errors': errors}
+    return data, errors
+
+# Loads every .json file of the folder in parallel and validates it against the schema. Returns ({file name: data}, errors),
+# errors as (file path, line, message) sorted by file and line. Files with errors are not in the result.
+# The parsed templates are shared through the cache, so callers must not modify them.
+def load_folder(folder, check, workers=DEFAULT_WORKERS):
+    fileNames = sorted(eachFile for eachFile in os.listdir(folder) if eachFile.endswith('.json') and not eachFile.startswith('.'))
+    paths = [os.path.join(folder, eachFile) for eachFile in fileNames]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(lambda eachPath: load_file(eachPath, check), paths))
+
+    loaded = {}
+    errors = []
+    for fileName, path, (data, fileErrors) in zip(fileNames, paths, results):
+        if fileErrors:
+            errors.extend((path, line, message) for line, message in sorted(fileErrors))
+        else:
+            loaded[fileName] = data
+    return loaded, errors
+
+def load_permission_sets(folder, workers=DEFAULT_WORKERS):
+    return load_folder(folder, checkPermissionSet, workers)
+
+# Permission set templates of the repository by permission set name, as used by the permission sets stage and the drift command.
+# The errors are reported and None is returned when any file has errors
+def load_permission_sets_by_name(folder, workers=DEFAULT_WORKERS):
+    psFiles, errors = load_permission_sets(folder, workers)
+    if report_errors(errors) > 0:
+        log.error("There are permission set templates with errors. Please check your templates.")
+        return None
+    return {psFiles[eachFile]['Name']: psFiles[eachFile] for eachFile in psFiles}
+
+def load_assignment_files(folder, workers=DEFAULT_WORKERS):
+    return load_folder(folder, checkAssignmentFile, workers)
+
+# Logs each error as file:line: message and returns the number of errors
+def report_errors(errors):
+    for path, line, message in errors:
+        log.error(f"{path}:{line}: {message}")
+    return len(errors)
@@ -0,0 +1,172 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Pipeline Shared Rate Limiter
+## +-----------------------------------
+
+import logging
+import threading
+import time
+
+from botocore.config import Config
+
+from identitycenter import clients
+from identitycenter import metrics
+
+log = logging.getLogger(__name__)
+
+# Calls per second allowed for each service when the run starts. They can be changed with --rate-limit
+# to match the quotas of the account (see the Service Quotas of IAM Identity Center and Organizations).
+DEFAULT_RATES = {
+    'sso-admin': 20,
+    'identitystore': 20,
+    'organizations': 10,
+    'iam': 10,
+    'accessanalyzer': 10
+}
+DEFAULT_RATE = 10
+
+# Attempts of each call (standard retry mode). Throttling is mostly avoided by the rate limiter,
+# so retries are only a safety net and the call fails instead of retrying for hours
+MAX_ATTEMPTS = 10
+
+# Seconds the whole run can take. Calls waiting for the rate limiter after it fail with DeadlineExceeded
+DEFAULT_DEADLINE = 7200
+
+# AIMD: the rate is multiplied by DECREASE_FACTOR when a call is throttled (at most once per DECREASE_INTERVAL seconds)
+# and grows by about INCREASE calls per second, every second with successful calls, up to the configured rate
+DECREASE_FACTOR = 0.5
+DECREASE_INTERVAL = 1.0
+INCREASE = 1.0
+MIN_RATE = 0.5
+
+# Retry configuration of every client. It replaces the adaptive mode, whose rate limiter is per client
+RETRY_CONFIG = Config(
+   retries = {
+      'max_attempts': MAX_ATTEMPTS,
+      'mode': 'standard'
+   }
+)
+
+class DeadlineExceeded(Exception):
+    pass
+
+# Token bucket shared by all the threads and clients of one service. Its rate adapts (AIMD) to the throttling observed
+class TokenBucket:
+    def __init__(self, rate):
+        self.maxRate = float(rate)
+        self.rate = float(rate)
+        self.tokens = max(1.0, self.rate)
+        self.updated = time.monotonic()
+        self.lastDecrease = 0.0
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Blocks until a call can be made. Raises DeadlineExceeded once the deadline (monotonic time) has passed,
+    # or if the call is only possible after it
+    def acquire(self, deadline=None):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    raise DeadlineExceeded('The deadline of the run was reached before calling AWS')
+                self.refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            if deadline is not None and now + delay > deadline:
+                raise DeadlineExceeded('The deadline of the run was reached while waiting to call AWS')
+            time.sleep(delay)
+
+    def on_throttle(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.lastDecrease < DECREASE_INTERVAL:
+                return
+            self.lastDecrease = now
+            self.refill(now)
+            self.rate = max(MIN_RATE, self.rate * DECREASE_FACTOR)
+            self.tokens = min(self.tokens, 0)
+
+    def on_success(self):
+        with self.lock:
+            if self.rate < self.maxRate:
+                self.rate = min(self.maxRate, self.rate + INCREASE / self.rate)
+
+# One token bucket per service, shared by every client and thread. Each attempt (including retries)
+# takes a token before it is sent, and the answers of AWS adjust the rate of the service.
+class RateLimiter:
+    def __init__(self, rates=None, deadline=None):
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.deadline = time.monotonic() + deadline if deadline else None
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, service):
+        with self.lock:
+            if service not in self.buckets:
+                self.buckets[service] = TokenBucket(self.rates.get(service, DEFAULT_RATE))
+            return self.buckets[service]
+
+    def on_before_send(self, service):
+        self.bucket(service).acquire(self.deadline)
+
+    def on_response(self, service, response):
+        if response[1].get('Error', {}).get('Code') in metrics.THROTTLING_CODES:
+            self.bucket(service).on_throttle()
+        elif 'Error' not in response[1]:
+            self.bucket(service).on_success()
+
+# Parses the --rate-limit values (SERVICE=CALLS_PER_SECOND)
+def parse_rates(values):
+    rates = {}
+    for value in values or []:
+        service, separator, rate = value.partition('=')
+        if not separator or float(rate) <= 0:
+            raise ValueError(f"Invalid rate limit '{value}'. Use SERVICE=CALLS_PER_SECOND, e.g. organizations=5")
+        rates[service] = float(rate)
+    return rates
+
+# Shared rate limiter of the run. The event handlers are registered once per session and always use it
+limiter = None
+
+# Event names are <event>.<service>.<Operation>
+def on_before_send(event_name, **kwargs):
+    if limiter is not None:
+        limiter.on_before_send(event_name.split('.')[1])
+
+def on_needs_retry(event_name, response=None, **kwargs):
+    if limiter is not None and response is not None:
+        limiter.on_response(event_name.split('.')[1], response)
+    return None
+
+# Starts limiting the calls made with the session (by default the boto3 default session, used by the scripts).
+# The limiter is registered first, so nothing is sent before it gives a token.
+def enable(rateLimits=None, deadline=DEFAULT_DEADLINE, session=None):
+    global limiter
+    limiter = RateLimiter(parse_rates(rateLimits), deadline)
+
+    session = clients.get_session(session)
+    session.events.register_first('before-send', on_before_send, unique_id='identitycenter-throttling-before-send')
+    session.events.register('needs-retry', on_needs_retry, unique_id='identitycenter-throttling-needs-retry')
+
+    log.info('Rate limits (calls per second): ' + ', '.join(f'{service}: {rate:g}' for service, rate in sorted(limiter.rates.items()))
+        + (f'. Deadline: {deadline}s' if deadline else ''))
+    return limiter
@@ -0,0 +1,336 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Templates Validation
+## +-----------------------------------
+
+import argparse
+import json
+import logging
+import os
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from identitycenter import cache
+from identitycenter import clients
+from identitycenter import metrics
+from identitycenter import permissionset_state
+from identitycenter import policy_lint
+from identitycenter import targets
+from identitycenter import templates
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 10
+
+# Action catalog bundled next to the validation script of the pipeline, so the validation stage never downloads it.
+# Refresh it by hand with --write-action-catalog and commit it
+DEFAULT_ACTION_CATALOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'validation', 'action-catalog.json.gz')
+
+# Arguments of the validation stage
+def add_arguments(parser):
+    parser.add_argument('--findings-cache', action="store", dest='findingsCache',
+        help='JSON file that keeps the Access Analyzer findings and the managed policies found in IAM between runs, so they are not checked again. Disabled by default')
+    parser.add_argument('--managed-policy-catalog', action="store", dest='managedPolicyCatalog',
+        help='JSON snapshot of the AWS managed policy ARNs. Policies in the snapshot are not checked in IAM')
+    parser.add_argument('--offline', action="store_true", dest='offline',
+        help='Never call IAM: managed policies that are not in --managed-policy-catalog are reported as errors')
+    parser.add_argument('--write-managed-policy-catalog', action="store", dest='writeManagedPolicyCatalog',
+        help='List all AWS managed policies in IAM, write them as a snapshot to this file and exit')
+    parser.add_argument('--action-catalog', action="store", dest='actionCatalog', default=DEFAULT_ACTION_CATALOG,
+        help='Action catalog used to lint the custom policies offline. It is required. Default: source/validation/action-catalog.json.gz')
+    parser.add_argument('--write-action-catalog', action="store", dest='writeActionCatalog',
+        help='Write an action catalog to this file (.gz to compress) from --action-catalog-source and exit')
+    parser.add_argument('--action-catalog-source', action="store", dest='actionCatalogSource', choices=['service-reference', 'botocore'], default='service-reference',
+        help='Source of --write-action-catalog: the Service Authorization Reference (downloaded, complete) or the service models '
+        + 'installed with botocore (offline, API operations only: actions not found are warnings). Default: %(default)s')
+
+# Loads and validates the structure of the templates (see templates.py). Returns the templates and the number of errors found
+def list_permission_set_folder():
+    perm_set_dict, errors = templates.load_permission_sets(args.psFolder, args.workers)
+    log.info('Permission Sets successfully loaded from repository files')
+    return perm_set_dict, templates.report_errors(errors)
+
+
+def list_assingment_folder():
+    assignmentFiles, errors = templates.load_assignment_files(args.asFolder, args.workers)
+    assig_dic = {
+        'Assignments': [
+            assignment
+            for eachFile in assignmentFiles
+            for assignment in assignmentFiles[eachFile]['Assignments']
+        ]
+    }
+    log.info('Assignments successfully loaded from repository files')
+    return assig_dic, templates.report_errors(errors)
+
+def validate_unique_permissionset_name():
+    list_of_permission_set_name = []
+    for permissionSet in permissionsetTemplates:
+        list_of_permission_set_name.append(permissionsetTemplates[permissionSet]['Name'])
+        
+    if len(list_of_permission_set_name) > len(set(list_of_permission_set_name)):
+        log.error("There are Permission Set templates with the same name. Please check your templates.")
+        exit (1)
+    
+    log.info("No permission sets with the same name were detected.")
+    return True
+
+def validate_unique_assignment_sids():
+    list_of_sids = []
+    for eachAssignment in assignmentsTemplates['Assignments']:
+        list_of_sids.append(eachAssignment['SID'])
+    
+    if len(list_of_sids) > len(set(list_of_sids)):
+        log.error("There are Assignment templates with the same SID. Please check your templates.")
+        exit (1)    
+    log.info("No asignment templates with the same SID were detected.") 
+    return True
+
+# Checks the format of every target expression (see targets.py) and returns the number of errors
+def validate_assignment_targets():
+    errors = 0
+    for eachAssignment in assignmentsTemplates['Assignments']:
+        for eachTarget in eachAssignment['Target']:
+            try:
+                targets.parse_target(eachTarget)
+            except ValueError as error:
+                log.error(f"[SID: {eachAssignment['SID']}] " + str(error))
+                errors += 1
+    return errors
+
+# Lints the custom policies of all permission sets locally with the action catalog (action names, wildcards,
+# condition keys and size), without calling AWS. Every finding is reported, and the number of errors is returned.
+def lint_custom_policies():
+    log.info(f"Linting the permission set custom policies (action catalog {actionCatalog.source} from {actionCatalog.generatedAt})")
+    errors = 0
+    for eachPermissionSet in sorted(permissionsetTemplates):
+        customPolicy = permissionsetTemplates[eachPermissionSet].get('CustomPolicy')
+        if not customPolicy:
+            continue
+        for findingType, message in policy_lint.lint_policy(actionCatalog, customPolicy):
+            if findingType == 'ERROR':
+                log.error(f"[{eachPermissionSet}] An error was found in the custom policy: " + message)
+                errors += 1
+            else:
+                log.warning(f"[{eachPermissionSet}] An issue was found in the custom policy: " + message)
+    return errors
+
+# Returns the findings of Access Analyzer for one policy document
+def analyze_policy(client, policyDocument):
+    findings = []
+    paginator = client.get_paginator('validate_policy')
+    for page in paginator.paginate(locale='EN', policyDocument=policyDocument, policyType='IDENTITY_POLICY'):
+        for eachFinding in page['findings']:
+            findings.append({
+                'findingType': eachFinding['findingType'],
+                'issueCode': eachFinding.get('issueCode', ''),
+                'findingDetails': eachFinding['findingDetails']
+            })
+    return findings
+
+# Validates the custom policies of all permission sets with Access Analyzer. Identical policies are sent only once, in parallel,
+# and the findings are cached under the hash of the canonical policy (see --findings-cache), so unchanged policies are not sent again.
+# Every finding is reported, and the number of errors is returned.
+def validate_json_policy_format():
+    log.info("Analyzing each one of the permission set custom policies.") 
+    client = clients.get_client('accessanalyzer')
+
+    # Group the permission sets by policy hash
+    policies = {}
+    for eachPermissionSet in permissionsetTemplates:
+        customPolicy = permissionsetTemplates[eachPermissionSet].get('CustomPolicy')
+        if customPolicy:
+            policyDocument = permissionset_state.canonical_json(customPolicy)
+            policyHash = hashlib.sha256(policyDocument.encode('utf-8')).hexdigest()
+            policies.setdefault(policyHash, {'Document': policyDocument, 'PermissionSets': []})['PermissionSets'].append(eachPermissionSet)
+        else:
+            log.info(f"[{eachPermissionSet}] There is no Custom Policy in the permission set. Skipping")
+
+    findings = {}
+    toAnalyze = []
+    for policyHash in policies:
+        cachedFindings = findingsCache.get('policyFindings', policyHash) if findingsCache else None
+        if cachedFindings is not None:
+            findings[policyHash] = cachedFindings
+        else:
+            toAnalyze.append(policyHash)
+
+    log.info(f"{len(policies)} distinct custom policies found. {len(toAnalyze)} will be analyzed and {len(policies) - len(toAnalyze)} were found in cache")
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        results = executor.map(lambda policyHash: analyze_policy(client, policies[policyHash]['Document']), toAnalyze)
+        for policyHash, policyFindings in zip(toAnalyze, results):
+            findings[policyHash] = policyFindings
+            if findingsCache:
+                findingsCache.put('policyFindings', policyHash, policyFindings)
+
+    errors = 0
+    for policyHash in policies:
+        for eachPermissionSet in sorted(policies[policyHash]['PermissionSets']):
+            log.info(f"[{eachPermissionSet}] Analyzing custom policy") 
+            for eachFinding in findings[policyHash]:
+                if eachFinding['findingType'] == 'ERROR':
+                    log.error(f"[{eachPermissionSet}] An error was found in the custom policy: " + str(eachFinding['findingDetails']))
+                    errors += 1
+                if eachFinding['findingType'] == 'WARNING':
+                    log.warning(f"[{eachPermissionSet}] An issue was found in the custom policy: " + str(eachFinding['findingDetails']))
+    return errors
+
+# Writes a snapshot of every AWS managed policy ARN, to be used with --managed-policy-catalog
+def write_managed_policy_catalog(path):
+    client = clients.get_client('iam')
+    policies = []
+    paginator = client.get_paginator('list_policies')
+    for page in paginator.paginate(Scope='AWS'):
+        policies.extend(eachPolicy['Arn'] for eachPolicy in page['Policies'])
+
+    with open(path, 'w') as f:
+        json.dump({'GeneratedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'Policies': sorted(policies)}, f, indent=1)
+    log.info(f"{len(policies)} AWS managed policies written to {path}")
+
+def load_managed_policy_catalog(path):
+    with open(path) as f:
+        catalog = json.load(f)
+    log.info(f"Managed policy catalog loaded: {len(catalog['Policies'])} policies generated at {catalog.get('GeneratedAt', 'unknown date')}")
+    return set(catalog['Policies'])
+
+# Returns None if the managed policy exists, otherwise the reason why it is not valid.
+# The catalog and the cache are checked first, and IAM is only called for the policies that are not there.
+def check_managed_policy(client, policyArn):
+    if policyArn in managedPolicyCatalog:
+        return None
+    if args.offline:
+        return "The policy is not in the managed policy catalog"
+    if findingsCache and findingsCache.get('managedPolicies', policyArn):
+        return None
+
+    try:
+        client.get_policy(PolicyArn=policyArn)
+    except Exception as error:
+        return str(error)
+
+    if findingsCache:
+        findingsCache.put('managedPolicies', policyArn, True)
+    return None
+
+# Checks that every AWS managed policy and AWS managed permission boundary used by the templates exists.
+# Each distinct ARN is checked only once, in parallel, and every issue is reported. Returns the number of errors.
+def validate_managed_policies_arn():
+    log.info("Analyzing each one of the permission set managed policies.") 
+    client = clients.get_client('iam')
+    errors = 0
+
+    # ARN -> permission sets (and how they use it)
+    references = {}
+    for eachPermissionSet in permissionsetTemplates:
+        for eachManagedPolicy in permissionsetTemplates[eachPermissionSet].get('ManagedPolicies') or []:
+            references.setdefault(eachManagedPolicy, []).append((eachPermissionSet, 'managed policy'))
+
+        permissionBoundary = permissionsetTemplates[eachPermissionSet].get('PermissionBoundary')
+        if permissionBoundary:
+            if permissionBoundary['PolicyType'] == 'AWS':
+                references.setdefault(permissionBoundary['Policy'], []).append((eachPermissionSet, 'AWS managed permission boundary policy'))
+            elif 'arn:aws' in permissionBoundary['Policy']:
+                log.error(f"[{eachPermissionSet}] Looks like you are using an AWS ARN instead of the name of the policy you want as Permission Boundary. Please review your template")
+                errors += 1
+
+    policyArns = sorted(references)
+    log.info(f"{len(policyArns)} distinct managed policies are used by the permission sets")
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        reasons = executor.map(lambda policyArn: check_managed_policy(client, policyArn), policyArns)
+        for policyArn, reason in zip(policyArns, reasons):
+            if reason is None:
+                continue
+            for eachPermissionSet, usage in references[policyArn]:
+                log.error(f"[{eachPermissionSet}] An issue was found in the {usage} {policyArn}. Reason: " + reason)
+                errors += 1
+
+    return errors
+                
+
+# Runs the validation stage. State shared with the other stages of the run is not needed here.
+# Returns True when it only wrote a catalog, so 'all' stops instead of running the next stages
+def run(arguments, state):
+    print("########################################")
+    print("# Starting AWS SSO Template Validation #")
+    print("########################################\n")
+
+    global args
+    args = argparse.Namespace(**vars(arguments))
+    if args.workers is None:
+        args.workers = DEFAULT_WORKERS
+
+    if args.writeActionCatalog:
+        if args.actionCatalogSource == 'botocore':
+            catalog = policy_lint.build_catalog_from_botocore()
+        else:
+            catalog = policy_lint.build_catalog_from_service_reference(args.workers)
+        policy_lint.write_catalog(catalog, args.writeActionCatalog)
+        return True
+
+    if args.writeManagedPolicyCatalog:
+        write_managed_policy_catalog(args.writeManagedPolicyCatalog)
+        return True
+
+    # Load templates files from folder to global variables
+    global permissionsetTemplates
+    global assignmentsTemplates
+    global findingsCache
+    global managedPolicyCatalog
+    global actionCatalog
+    with metrics.phase('load-templates'):
+        permissionsetTemplates, permissionsetErrors = list_permission_set_folder()
+        assignmentsTemplates, assignmentErrors = list_assingment_folder()
+    if permissionsetErrors + assignmentErrors > 0:
+        log.error(f"{permissionsetErrors + assignmentErrors} errors were found in the structure of the templates. Please check your templates.")
+        exit (1)
+
+
+    # List of controls that will be validated
+    validate_unique_permissionset_name()
+    validate_unique_assignment_sids()
+    findingsCache = cache.PersistentCache(args.findingsCache, scope='accessanalyzer') if args.findingsCache else None
+    managedPolicyCatalog = load_managed_policy_catalog(args.managedPolicyCatalog) if args.managedPolicyCatalog else set()
+    if not os.path.exists(args.actionCatalog):
+        log.error(f"Action catalog {args.actionCatalog} not found. Create it with --write-action-catalog {args.actionCatalog} and commit it")
+        exit (1)
+    try:
+        actionCatalog = policy_lint.load_catalog(args.actionCatalog)
+    except (OSError, ValueError) as error:
+        log.error(f"It was not possible to load the action catalog {args.actionCatalog}. Reason: " + str(error))
+        exit (1)
+    targetErrors = validate_assignment_targets()
+    with metrics.phase('lint'):
+        lintErrors = lint_custom_policies()
+    errors = targetErrors + lintErrors
+    if args.offline:
+        log.info("Offline mode: custom policies are not sent to Access Analyzer")
+    elif lintErrors > 0:
+        log.info("Custom policies are not sent to Access Analyzer until the lint errors are fixed")
+    else:
+        with metrics.phase('access-analyzer'):
+            errors += validate_json_policy_format()
+    with metrics.phase('managed-policies'):
+        errors += validate_managed_policies_arn()
+    if findingsCache:
+        findingsCache.save()
+
+    if errors > 0:
+        log.error(f"{errors} errors were found in the templates. Please check your templates.")
+        exit (1)
+    
+    log.info('Congrats! All templates were evaluated without errors! :)')
@@ -0,0 +1,126 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Account Assignments Reconciler Tests
+## +-----------------------------------
+
+import os
+import sys
+import unittest
+
+import boto3
+from botocore.stub import Stubber
+
+"""
+Tests of the --apply reconciler of the assignments stage against a stubbed sso-admin client (botocore Stubber).
+Run them from the root of the repository with 'python -m unittest discover tests' (or pytest)
+"""
+
+# The tests import the identitycenter package from source/, as 'python -m identitycenter' does from that folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'source'))
+
+from identitycenter import account_assignments
+
+INSTANCE_ARN = 'arn:aws:sso:::instance/ssoins-1111111111111111'
+PERMISSION_SET_ARN = 'arn:aws:sso:::permissionSet/ssoins-1111111111111111/ps-1111111111111111'
+MANAGEMENT_ACCOUNT = '999999999999'
+CREATE_REQUEST = '11111111-1111-4111-8111-111111111111'
+DELETE_REQUEST = '22222222-2222-4222-8222-222222222222'
+
+def key(accountId, principalType, principalId):
+    return (accountId, PERMISSION_SET_ARN, principalType, principalId)
+
+def assignment(accountId, principalType, principalId):
+    return {'AccountId': accountId, 'PermissionSetArn': PERMISSION_SET_ARN, 'PrincipalType': principalType, 'PrincipalId': principalId}
+
+def request_status(requestId, status, failureReason=None):
+    requestStatus = {'RequestId': requestId, 'Status': status}
+    if failureReason:
+        requestStatus['FailureReason'] = failureReason
+    return requestStatus
+
+def change_parameters(accountId, principalType, principalId):
+    return {'InstanceArn': INSTANCE_ARN, 'TargetId': accountId, 'TargetType': 'AWS_ACCOUNT', 'PermissionSetArn': PERMISSION_SET_ARN,
+        'PrincipalType': principalType, 'PrincipalId': principalId}
+
+# One worker everywhere, so the calls are made in the order the responses are stubbed
+class ApplyAssignmentChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.client = boto3.client('sso-admin', region_name='us-east-1', aws_access_key_id='test', aws_secret_access_key='test')
+        self.stubber = Stubber(self.client)
+        self.stubber.activate()
+
+    def tearDown(self):
+        self.stubber.deactivate()
+
+    def test_lists_the_current_assignments_of_the_managed_permission_sets(self):
+        self.stubber.add_response('list_accounts_for_provisioned_permission_set', {'AccountIds': ['111111111111', '222222222222']},
+            {'InstanceArn': INSTANCE_ARN, 'PermissionSetArn': PERMISSION_SET_ARN})
+        self.stubber.add_response('list_account_assignments', {'AccountAssignments': [assignment('111111111111', 'GROUP', 'group-1')]},
+            {'InstanceArn': INSTANCE_ARN, 'AccountId': '111111111111', 'PermissionSetArn': PERMISSION_SET_ARN})
+        self.stubber.add_response('list_account_assignments', {'AccountAssignments': [assignment('222222222222', 'USER', 'user-1')]},
+            {'InstanceArn': INSTANCE_ARN, 'AccountId': '222222222222', 'PermissionSetArn': PERMISSION_SET_ARN})
+
+        current = account_assignments.list_current_assignments(self.client, INSTANCE_ARN, [PERMISSION_SET_ARN], workers=1)
+
+        self.assertEqual(current, {key('111111111111', 'GROUP', 'group-1'), key('222222222222', 'USER', 'user-1')})
+        self.stubber.assert_no_pending_responses()
+
+    def test_diff_never_deletes_in_protected_accounts(self):
+        current = {key('111111111111', 'GROUP', 'group-1'), key('222222222222', 'USER', 'user-1'), key(MANAGEMENT_ACCOUNT, 'USER', 'user-1')}
+        desired = {key('111111111111', 'GROUP', 'group-1'), key('333333333333', 'GROUP', 'group-2')}
+
+        toCreate, toDelete = account_assignments.diff_assignments(current, desired, protectedAccounts={MANAGEMENT_ACCOUNT})
+
+        self.assertEqual(toCreate, [key('333333333333', 'GROUP', 'group-2')])
+        self.assertEqual(toDelete, [key('222222222222', 'USER', 'user-1')])
+
+    def test_creates_and_deletes_the_differences_and_waits_for_them(self):
+        self.stubber.add_response('create_account_assignment', {'AccountAssignmentCreationStatus': request_status(CREATE_REQUEST, 'IN_PROGRESS')},
+            change_parameters('333333333333', 'GROUP', 'group-2'))
+        self.stubber.add_response('delete_account_assignment', {'AccountAssignmentDeletionStatus': request_status(DELETE_REQUEST, 'IN_PROGRESS')},
+            change_parameters('222222222222', 'USER', 'user-1'))
+        self.stubber.add_response('describe_account_assignment_creation_status', {'AccountAssignmentCreationStatus': request_status(CREATE_REQUEST, 'SUCCEEDED')},
+            {'InstanceArn': INSTANCE_ARN, 'AccountAssignmentCreationRequestId': CREATE_REQUEST})
+        self.stubber.add_response('describe_account_assignment_deletion_status',
+            {'AccountAssignmentDeletionStatus': request_status(DELETE_REQUEST, 'FAILED', 'Received a 404 status error')},
+            {'InstanceArn': INSTANCE_ARN, 'AccountAssignmentDeletionRequestId': DELETE_REQUEST})
+
+        results = account_assignments.apply_assignment_changes(self.client, INSTANCE_ARN,
+            [key('333333333333', 'GROUP', 'group-2')], [key('222222222222', 'USER', 'user-1')], workers=1, timeout=60)
+
+        self.assertEqual(results[('CREATE', key('333333333333', 'GROUP', 'group-2'))]['Status'], 'SUCCEEDED')
+        self.assertEqual(results[('DELETE', key('222222222222', 'USER', 'user-1'))],
+            {'RequestId': DELETE_REQUEST, 'Status': 'FAILED', 'FailureReason': 'Received a 404 status error'})
+        self.assertEqual(account_assignments.report_assignment_results(results), 1)
+        self.stubber.assert_no_pending_responses()
+
+    def test_a_rejected_request_fails_only_its_change(self):
+        self.stubber.add_client_error('create_account_assignment', 'ConflictException', 'An assignment request is already in progress',
+            expected_params=change_parameters('333333333333', 'GROUP', 'group-2'))
+        self.stubber.add_response('delete_account_assignment', {'AccountAssignmentDeletionStatus': request_status(DELETE_REQUEST, 'SUCCEEDED')},
+            change_parameters('222222222222', 'USER', 'user-1'))
+
+        results = account_assignments.apply_assignment_changes(self.client, INSTANCE_ARN,
+            [key('333333333333', 'GROUP', 'group-2')], [key('222222222222', 'USER', 'user-1')], workers=1, timeout=60)
+
+        self.assertEqual(results[('CREATE', key('333333333333', 'GROUP', 'group-2'))]['Status'], 'FAILED')
+        self.assertIn('ConflictException', results[('CREATE', key('333333333333', 'GROUP', 'group-2'))]['FailureReason'])
+        self.assertEqual(results[('DELETE', key('222222222222', 'USER', 'user-1'))]['Status'], 'SUCCEEDED')
+        self.stubber.assert_no_pending_responses()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+## + -----------------------
+## | AWS SSO Account Move Delta Tests
+## +-----------------------------------
+
+import copy
+import json
+import os
+import sys
+import unittest
+
+"""
+Tests of the --move-event mode of the assignments stage with the recorded MoveAccount event in source/assignments/events.
+Run them from the root of the repository with 'python -m unittest discover tests' (or pytest)
+"""
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The tests import the identitycenter package from source/, as 'python -m identitycenter' does from that folder
+sys.path.insert(0, os.path.join(REPOSITORY, 'source'))
+
+from identitycenter import account_move
+from identitycenter import organization
+
+MOVE_EVENT = os.path.join(REPOSITORY, 'source', 'assignments', 'events', 'move-account.json')
+
+# Account 123456789012 of the recorded event moves from Development (ou-abcd-11111111) to Production (ou-abcd-22222222),
+# both under Workloads (ou-abcd-00000000)
+ORGANIZATION = {
+    'RootId': 'r-abcd',
+    'Children': {
+        'r-abcd': ['ou-abcd-00000000', 'ou-abcd-33333333'],
+        'ou-abcd-00000000': ['ou-abcd-11111111', 'ou-abcd-22222222'],
+        'ou-abcd-11111111': [],
+        'ou-abcd-22222222': [],
+        'ou-abcd-33333333': []
+    },
+    'Accounts': {
+        'r-abcd': ['111111111111'],
+        'ou-abcd-00000000': [],
+        'ou-abcd-11111111': ['123456789012', '210987654321'],
+        'ou-abcd-22222222': ['345678901234'],
+        'ou-abcd-33333333': ['456789012345']
+    }
+}
+
+ASSIGNMENTS = [
+    {'SID': 'Developers', 'Target': ['development:ou-abcd-11111111'], 'PrincipalType': 'GROUP', 'PrincipalId': 'Developers', 'PermissionSetName': 'Developer'},
+    {'SID': 'Operators', 'Target': ['production:ou-abcd-22222222'], 'PrincipalType': 'GROUP', 'PrincipalId': 'Operators', 'PermissionSetName': 'Operator'},
+    {'SID': 'Security', 'Target': ['workloads:ou-abcd-00000000:*'], 'PrincipalType': 'GROUP', 'PrincipalId': 'Security', 'PermissionSetName': 'SecurityAudit'},
+    {'SID': 'Admin', 'Target': ['Root', '!production:ou-abcd-22222222'], 'PrincipalType': 'USER', 'PrincipalId': 'admin@example.com', 'PermissionSetName': 'Admin'},
+    {'SID': 'Account', 'Target': ['account:123456789012'], 'PrincipalType': 'USER', 'PrincipalId': 'owner@example.com', 'PermissionSetName': 'Operator'},
+    {'SID': 'Sandbox', 'Target': ['sandbox:ou-abcd-33333333'], 'PrincipalType': 'GROUP', 'PrincipalId': 'Developers', 'PermissionSetName': 'Admin'}
+]
+
+PRINCIPAL_IDS = {
+    ('Developers', 'GROUP'): 'group-developers',
+    ('Operators', 'GROUP'): 'group-operators',
+    ('Security', 'GROUP'): 'group-security',
+    ('admin@example.com', 'USER'): 'user-admin',
+    ('owner@example.com', 'USER'): 'user-owner'
+}
+
+PERMISSION_SET_ARNS = {name: f'arn:aws:sso:::permissionSet/ssoins-1111111111111111/ps-{name.lower()}' for name in ('Developer', 'Operator', 'SecurityAudit', 'Admin')}
+
+def load_move_event():
+    with open(MOVE_EVENT) as f:
+        return json.load(f)
+
+class AccountMoveTest(unittest.TestCase):
+    def test_parses_the_recorded_event(self):
+        self.assertEqual(account_move.parse_move_event(load_move_event()),
+            {'AccountId': '123456789012', 'SourceParentId': 'ou-abcd-11111111', 'DestinationParentId': 'ou-abcd-22222222'})
+
+    def test_parses_the_cloudtrail_record_only(self):
+        self.assertEqual(account_move.parse_move_event(load_move_event()['detail'])['AccountId'], '123456789012')
+
+    def test_rejects_a_failed_move(self):
+        event = load_move_event()
+        event['detail']['errorCode'] = 'AccessDeniedException'
+        with self.assertRaises(ValueError):
+            account_move.parse_move_event(event)
+
+    def test_delta_of_the_recorded_move(self):
+        move = account_move.parse_move_event(load_move_event())
+        index = organization.OrganizationIndex.from_dict(ORGANIZATION)
+        sourceChain = account_move.parent_chain_from_index(index, move['SourceParentId'])
+        destinationChain = account_move.parent_chain_from_index(index, move['DestinationParentId'])
+        self.assertEqual(sourceChain, ['ou-abcd-11111111', 'ou-abcd-00000000', 'r-abcd'])
+        self.assertEqual(destinationChain, ['ou-abcd-22222222', 'ou-abcd-00000000', 'r-abcd'])
+
+        toCreate, toDelete = account_move.move_delta(ASSIGNMENTS, move['AccountId'], sourceChain, destinationChain, PRINCIPAL_IDS, PERMISSION_SET_ARNS)
+
+        # Nested OU, account and root targets cover the account in both places, so they don't change
+        self.assertEqual(toCreate, [('123456789012', PERMISSION_SET_ARNS['Operator'], 'GROUP', 'group-operators')])
+        self.assertEqual(toDelete, [
+            ('123456789012', PERMISSION_SET_ARNS['Admin'], 'USER', 'user-admin'),
+            ('123456789012', PERMISSION_SET_ARNS['Developer'], 'GROUP', 'group-developers')
+        ])
+
+    def test_moves_the_account_in_the_cached_organization(self):
+        indexData = copy.deepcopy(ORGANIZATION)
+        self.assertTrue(account_move.patch_organization_index(indexData, '123456789012', 'ou-abcd-11111111', 'ou-abcd-22222222'))
+        self.assertEqual(indexData['Accounts']['ou-abcd-11111111'], ['210987654321'])
+        self.assertEqual(indexData['Accounts']['ou-abcd-22222222'], ['345678901234', '123456789012'])
+        self.assertFalse(account_move.patch_organization_index(indexData, '123456789012', 'ou-abcd-22222222', 'ou-abcd-99999999'))
+
+if __name__ == '__main__':
+    unittest.main()